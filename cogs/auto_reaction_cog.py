@@ -1,7 +1,9 @@
 import nextcord
 from nextcord.ext import commands
 from nextcord import SlashOption
+import asyncio
 import logging
+import re
 from typing import List, Optional, Dict, Any
 from db_utils.auto_reaction_database import (
     initialize_database, get_config, update_config, 
@@ -10,12 +12,69 @@ from db_utils.auto_reaction_database import (
     add_channel_exception, remove_channel_exception, get_channel_exceptions
 )
 
+# Custom emoji format: <:name:id> or <a:name:id>
+_CUSTOM_EMOJI_RE = re.compile(r'<a?:\w+:\d+>')
+
+# Descriptions shown when a mode is set (long) and in the settings overview (short)
+_MODE_DESCRIPTIONS = {
+    "all": "All messages in all channels",
+    "forum_posts": "Only initial forum posts",
+    "threads": "Only messages in threads",
+    "regular_channels": "Only regular text channels (no threads/forums)",
+    "forum_and_threads": "Forum posts and thread messages",
+    "exclude_threads": "All channels except threads"
+}
+
+_MODE_SHORT_DESCRIPTIONS = {
+    "all": "All messages",
+    "forum_posts": "Forum posts only",
+    "threads": "Threads only",
+    "regular_channels": "Regular channels only",
+    "forum_and_threads": "Forums and threads",
+    "exclude_threads": "All except threads"
+}
+
+_TYPE_NAMES = {
+    "channel": "📝 Text Channels",
+    "thread": "🧵 Threads",
+    "forum_post": "📋 Forum Posts",
+    "forum_channel": "🗂️ Forum Channels"
+}
+
 class AutoReactionCog(commands.Cog):
     """Cog for automatically adding reactions to messages in configured channels."""
     
     def __init__(self, bot):
         self.bot = bot
-        
+        # Per-guild snapshot of config/exceptions/reaction sets/targets used by on_message
+        self._guild_state: Dict[int, Dict[str, Any]] = {}
+
+    def _get_cached(self, guild_id: int) -> Dict[str, Any]:
+        """Returns the cached auto-reaction state for a guild, loading it from the database on a miss."""
+        state = self._guild_state.get(guild_id)
+        if state is None:
+            state = {
+                'config': get_config(guild_id),
+                'exceptions': frozenset(get_channel_exceptions(guild_id)),
+                'reaction_sets': get_reaction_sets(guild_id),
+                'target_ids': frozenset(target_id for target_id, _ in get_target_channels(guild_id)),
+            }
+            self._guild_state[guild_id] = state
+        return state
+
+    def _invalidate_cache(self, guild_id: int):
+        """Drops the cached state for a guild so the next message reloads it."""
+        self._guild_state.pop(guild_id, None)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        """Warm the per-guild cache so the first message after startup doesn't wait on SQLite."""
+        await asyncio.gather(
+            *(asyncio.to_thread(self._get_cached, guild.id) for guild in self.bot.guilds),
+            return_exceptions=True
+        )
+        logging.info(f"AutoReactionCog: Warmed config cache for {len(self._guild_state)} guild(s).")
+
     async def cog_application_command_before_invoke(self, interaction: nextcord.Interaction):
         """Ensure database is initialized before any command."""
         initialize_database(interaction.guild_id)
@@ -45,6 +104,7 @@ class AutoReactionCog(commands.Cog):
         success = update_config(interaction.guild_id, {"enabled": enabled})
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             status = "enabled" if enabled else "disabled"
             await interaction.response.send_message(f"✅ Auto-reactions have been **{status}** for this server.")
         else:
@@ -71,24 +131,18 @@ class AutoReactionCog(commands.Cog):
             await interaction.response.send_message("❌ Please provide at least one reaction.", ephemeral=True)
             return
 
-        # Validate reactions
-        valid_reactions = []
+        # Validate reactions: anything that looks like a custom emoji must be well-formed,
+        # everything else is passed through as a unicode emoji
         for reaction in reaction_list:
-            # Check if it's a custom emoji (format: <:name:id> or <a:name:id>)
-            if reaction.startswith('<') and reaction.endswith('>'):
-                valid_reactions.append(reaction)
-            # Check if it's a unicode emoji
-            else:
-                try:
-                    # Try to add it as a reaction to validate
-                    valid_reactions.append(reaction)
-                except:
-                    await interaction.response.send_message(f"❌ Invalid reaction: {reaction}", ephemeral=True)
-                    return
+            if reaction.startswith('<') and not _CUSTOM_EMOJI_RE.fullmatch(reaction):
+                await interaction.response.send_message(f"❌ Invalid reaction: {reaction}", ephemeral=True)
+                return
+        valid_reactions = reaction_list
 
         success = add_reaction_set(interaction.guild_id, name, valid_reactions)
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             reactions_str = " ".join(valid_reactions)
             await interaction.response.send_message(f"✅ Added reaction set **{name}**: {reactions_str}")
         else:
@@ -111,6 +165,7 @@ class AutoReactionCog(commands.Cog):
         success = remove_reaction_set(interaction.guild_id, name)
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             await interaction.response.send_message(f"✅ Removed reaction set **{name}**.")
         else:
             await interaction.response.send_message(f"❌ Reaction set **{name}** not found.", ephemeral=True)
@@ -162,19 +217,11 @@ class AutoReactionCog(commands.Cog):
             await interaction.response.send_message("❌ You need 'Manage Server' permission to use this command.", ephemeral=True)
             return
 
-        mode_descriptions = {
-            "all": "All messages in all channels",
-            "forum_posts": "Only initial forum posts",
-            "threads": "Only messages in threads",
-            "regular_channels": "Only regular text channels (no threads/forums)",
-            "forum_and_threads": "Forum posts and thread messages",
-            "exclude_threads": "All channels except threads"
-        }
-
         success = update_config(interaction.guild_id, {"reaction_mode": mode})
         
         if success:
-            description = mode_descriptions.get(mode, mode)
+            self._invalidate_cache(interaction.guild_id)
+            description = _MODE_DESCRIPTIONS.get(mode, mode)
             await interaction.response.send_message(f"✅ Reaction mode set to: **{description}**")
         else:
             await interaction.response.send_message("❌ Failed to update reaction mode.", ephemeral=True)
@@ -206,6 +253,7 @@ class AutoReactionCog(commands.Cog):
         success = add_target_channel(interaction.guild_id, channel.id, channel_type)
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             await interaction.response.send_message(f"✅ Added {channel.mention} as an auto-reaction target ({channel_type}).")
         else:
             await interaction.response.send_message(f"❌ {channel.mention} is already in the targets list.", ephemeral=True)
@@ -227,6 +275,7 @@ class AutoReactionCog(commands.Cog):
         success = remove_target_channel(interaction.guild_id, channel.id)
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             await interaction.response.send_message(f"✅ Removed {channel.mention} from auto-reaction targets.")
         else:
             await interaction.response.send_message(f"❌ {channel.mention} was not in the targets list.", ephemeral=True)
@@ -260,16 +309,9 @@ class AutoReactionCog(commands.Cog):
             else:
                 grouped_targets[channel_type].append(f"Unknown Channel ({channel_id})")
 
-        type_names = {
-            "channel": "📝 Text Channels",
-            "thread": "🧵 Threads", 
-            "forum_post": "📋 Forum Posts",
-            "forum_channel": "🗂️ Forum Channels"
-        }
-
         for channel_type, channels in grouped_targets.items():
             embed.add_field(
-                name=type_names.get(channel_type, channel_type.title()),
+                name=_TYPE_NAMES.get(channel_type, channel_type.title()),
                 value="\n".join(channels)[:1024],
                 inline=False
             )
@@ -293,6 +335,7 @@ class AutoReactionCog(commands.Cog):
         success = add_channel_exception(interaction.guild_id, channel.id)
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             await interaction.response.send_message(f"✅ Added {channel.mention} to auto-reaction exceptions.")
         else:
             await interaction.response.send_message(f"❌ {channel.mention} is already in the exceptions list.", ephemeral=True)
@@ -314,6 +357,7 @@ class AutoReactionCog(commands.Cog):
         success = remove_channel_exception(interaction.guild_id, channel.id)
         
         if success:
+            self._invalidate_cache(interaction.guild_id)
             await interaction.response.send_message(f"✅ Removed {channel.mention} from auto-reaction exceptions.")
         else:
             await interaction.response.send_message(f"❌ {channel.mention} was not in the exceptions list.", ephemeral=True)
@@ -370,19 +414,10 @@ class AutoReactionCog(commands.Cog):
             inline=True
         )
         
-        mode_descriptions = {
-            "all": "All messages",
-            "forum_posts": "Forum posts only",
-            "threads": "Threads only",
-            "regular_channels": "Regular channels only",
-            "forum_and_threads": "Forums and threads",
-            "exclude_threads": "All except threads"
-        }
-        
         mode = config.get('reaction_mode', 'all')
         embed.add_field(
             name="Reaction Mode",
-            value=mode_descriptions.get(mode, mode),
+            value=_MODE_SHORT_DESCRIPTIONS.get(mode, mode),
             inline=True
         )
         
@@ -428,27 +463,17 @@ class AutoReactionCog(commands.Cog):
 
         await interaction.response.send_message(embed=embed)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: nextcord.Message):
-        """Handle new messages and add reactions if configured."""
-        # Ignore bot messages
-        if message.author.bot:
-            return
-            
-        # Ignore messages without a guild
-        if not message.guild:
-            return
-
-        # Get configuration
-        config = get_config(message.guild.id)
+    async def handle_message(self, message: nextcord.Message):
+        """Add reactions to a new message if configured. Dispatched by MessageRouterCog for non-bot guild messages."""
+        state = self._get_cached(message.guild.id)
+        config = state['config']
         
         # Check if auto-reactions are enabled
         if not config or not config.get('enabled', False):
             return
 
         # Check if channel is in exceptions
-        exceptions = get_channel_exceptions(message.guild.id)
-        if message.channel.id in exceptions:
+        if message.channel.id in state['exceptions']:
             return
 
         # Check reaction mode
@@ -458,27 +483,16 @@ class AutoReactionCog(commands.Cog):
         if not should_react:
             return
 
-        # Get reaction sets
-        reaction_sets = get_reaction_sets(message.guild.id)
+        reaction_sets = state['reaction_sets']
         if not reaction_sets:
             return
 
-        # Check if we have specific targets configured
-        targets = get_target_channels(message.guild.id)
-        
-        if targets:
-            # If we have specific targets, only react in those channels
-            target_ids = [target_id for target_id, _ in targets]
-            
-            # Check if current channel is in targets
-            is_target = message.channel.id in target_ids
-            
-            # For forum channels, also check if the parent is a target
-            if not is_target and isinstance(message.channel, nextcord.Thread):
-                if message.channel.parent and message.channel.parent.id in target_ids:
-                    is_target = True
-            
-            if not is_target:
+        # If we have specific targets, only react in those channels (threads also match via their parent)
+        target_ids = state['target_ids']
+        if target_ids:
+            channel = message.channel
+            effective_id = channel.parent.id if isinstance(channel, nextcord.Thread) and channel.parent else channel.id
+            if channel.id not in target_ids and effective_id not in target_ids:
                 return
 
         # Apply all reactions from all sets
@@ -4,16 +4,45 @@ from nextcord import Interaction, SlashOption # Added Interaction, SlashOption
 import json
 import logging
 import os
-from typing import List, Dict, Any, Optional # For type hinting
+import re
+from typing import List, Dict, Any, Optional, Tuple # For type hinting
+
+try:
+    import ahocorasick # pyahocorasick, used to match all 'contains' triggers in one pass
+except ImportError:
+    ahocorasick = None
+    logging.warning("AutoResponderCog: pyahocorasick not installed. 'contains' triggers will fall back to a linear scan.")
+
+try:
+    import orjson # Faster JSON parsing for the responses file; falls back to the stdlib json module
+except ImportError:
+    orjson = None
 
 # Path to the JSON file - assumes auto_responses.json is in the bot's root project directory
 # This path goes up one level from the cogs/ directory to the project root.
 RESPONSES_FILE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'auto_responses.json')
 
+# Per-author placeholders substituted into response text in a single pass
+_PLACEHOLDER_RE = re.compile(r'\{(user_mention|user_name|user_display_name)\}')
+
 class AutoResponderCog(commands.Cog, name="Auto Responder"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        # target_guild_id is fixed when the bot is constructed, so read it once instead of per message
+        self._target_guild_id: Optional[int] = getattr(bot, 'target_guild_id', None)
         self.auto_responses: List[Dict[str, Any]] = []
+        # Lookup structures compiled from auto_responses by _build_matchers(); values are rule indices
+        self.exact_map: Dict[str, int] = {}     # lowered trigger -> rule (case-insensitive rules)
+        self.exact_map_cs: Dict[str, int] = {}  # trigger -> rule (case-sensitive rules)
+        self.contains_ac = None                 # Aho-Corasick automaton over lowered 'contains' triggers
+        self.contains_ac_cs = None              # Aho-Corasick automaton over case-sensitive 'contains' triggers
+        self.contains_rules: List[Tuple[int, Dict[str, Any]]] = []  # (rule index, rule) for 'contains' rules only
+        self._needs_lower = False  # any usable case-insensitive rule loaded
+        self._needs_cs = False     # any usable case-sensitive rule loaded
+        self._responses_stat: Optional[Tuple[int, int]] = None  # (mtime_ns, size) of the file at the last successful load
+        # "{loaded_cogs_list}" reply, rebuilt only when the set of loaded extensions changes
+        self._cached_cogs_key: Optional[Tuple[str, ...]] = None
+        self._cached_cogs_str: str = ""
         self.load_responses()
 
     def load_responses(self):
@@ -37,24 +66,135 @@ class AutoResponderCog(commands.Cog, name="Auto Responder"):
                             "match_type": "exact"
                         }
                     ], f, indent=2)
-                # Then load it
-                with open(RESPONSES_FILE_PATH, 'r', encoding='utf-8') as f:
-                    self.auto_responses = json.load(f)
-            else: # File exists, load it
-                with open(RESPONSES_FILE_PATH, 'r', encoding='utf-8') as f:
-                    self.auto_responses = json.load(f)
+
+            # Skip re-parsing and recompiling when the file hasn't changed since the last successful load
+            stat = os.stat(RESPONSES_FILE_PATH)
+            stat_key = (stat.st_mtime_ns, stat.st_size)
+            if stat_key == self._responses_stat and self.auto_responses:
+                logging.info(f"AutoResponderCog: {RESPONSES_FILE_PATH} unchanged since last load. Keeping {len(self.auto_responses)} rule(s).")
+                return
+
+            with open(RESPONSES_FILE_PATH, 'rb') as f:
+                raw_responses = f.read()
+            self.auto_responses = orjson.loads(raw_responses) if orjson else json.loads(raw_responses)
+            self._responses_stat = stat_key
             
             logging.info(f"AutoResponderCog: Successfully loaded {len(self.auto_responses)} auto-response rule(s) from {RESPONSES_FILE_PATH}.")
 
         except FileNotFoundError: # Should be caught by os.path.exists, but as a fallback
             logging.error(f"CRITICAL: Auto-responses file NOT FOUND at {RESPONSES_FILE_PATH} after attempting to create. Auto-responder will not work.")
             self.auto_responses = []
-        except json.JSONDecodeError:
+            self._responses_stat = None
+        except json.JSONDecodeError: # orjson.JSONDecodeError is a subclass of this
             logging.error(f"Error decoding JSON from {RESPONSES_FILE_PATH}. Auto-responder will not work. Please check the file for syntax errors.")
             self.auto_responses = []
+            self._responses_stat = None
         except Exception as e:
             logging.error(f"An unexpected error occurred loading auto-responses: {e}", exc_info=True)
             self.auto_responses = []
+            self._responses_stat = None
+
+        self._build_matchers()
+
+    def _build_matchers(self):
+        """Compiles the loaded rules into dicts for 'exact' triggers and Aho-Corasick automata for 'contains' triggers."""
+        exact_map: Dict[str, int] = {}
+        exact_map_cs: Dict[str, int] = {}
+        contains_rules: List[Tuple[int, Dict[str, Any]]] = []
+        contains_ac = ahocorasick.Automaton() if ahocorasick else None
+        contains_ac_cs = ahocorasick.Automaton() if ahocorasick else None
+        needs_lower = needs_cs = False
+
+        for idx, entry in enumerate(self.auto_responses):
+            triggers: List[str] = entry.get("triggers", [])
+            if not entry.get("response") or not triggers:
+                continue
+            case_sensitive: bool = entry.get("case_sensitive", False)
+            match_type: str = entry.get("match_type", "exact")
+            normalised = list(triggers) if case_sensitive else [trigger.lower() for trigger in triggers]
+            if match_type == "contains" and "" in normalised:
+                # An empty trigger is contained in every message, so drop it for both the automaton and the fallback scan
+                logging.warning(f"AutoResponderCog: Ignoring empty 'contains' trigger in auto-response rule #{idx + 1}.")
+                normalised = [trigger for trigger in normalised if trigger]
+                if not normalised:
+                    continue
+            # Normalise once at load time so no per-message .lower()/.get() is needed on the rule
+            entry["_case_sensitive"] = case_sensitive
+            entry["_match_type"] = match_type
+            entry["_triggers"] = normalised
+            if case_sensitive:
+                needs_cs = True
+            else:
+                needs_lower = True
+            if match_type == "contains":
+                entry["_min_trigger_len"] = min(len(trigger) for trigger in entry["_triggers"])
+                contains_rules.append((idx, entry))
+
+            for key in entry["_triggers"]:
+                if match_type == "exact":
+                    # setdefault keeps the earliest rule, matching the old first-rule-wins order
+                    (exact_map_cs if case_sensitive else exact_map).setdefault(key, idx)
+                elif match_type == "contains" and contains_ac is not None:
+                    automaton = contains_ac_cs if case_sensitive else contains_ac
+                    if key not in automaton:
+                        automaton.add_word(key, idx)
+
+        for automaton in (contains_ac, contains_ac_cs):
+            if automaton is not None and len(automaton):
+                automaton.make_automaton()
+
+        self.exact_map = exact_map
+        self.exact_map_cs = exact_map_cs
+        self.contains_rules = contains_rules
+        self._needs_lower = needs_lower
+        self._needs_cs = needs_cs
+        self.contains_ac = contains_ac if contains_ac is not None and len(contains_ac) else None
+        self.contains_ac_cs = contains_ac_cs if contains_ac_cs is not None and len(contains_ac_cs) else None
+
+    def _find_rule(self, msg_content: str) -> Optional[Dict[str, Any]]:
+        """Returns the first rule (in file order) with a trigger matching the message, or None."""
+        # Only lower-case the message when a case-insensitive rule exists
+        lowered = msg_content.lower() if self._needs_lower else None
+        matched: List[int] = []
+
+        if self._needs_cs:
+            idx = self.exact_map_cs.get(msg_content)
+            if idx is not None:
+                matched.append(idx)
+        if lowered is not None:
+            idx = self.exact_map.get(lowered)
+            if idx is not None:
+                matched.append(idx)
+
+        if ahocorasick is not None:
+            if self.contains_ac is not None:
+                matched.extend(rule_idx for _, rule_idx in self.contains_ac.iter(lowered))
+            if self.contains_ac_cs is not None:
+                matched.extend(rule_idx for _, rule_idx in self.contains_ac_cs.iter(msg_content))
+        else:
+            for rule_idx, entry in self.contains_rules:
+                text_to_check = msg_content if entry["_case_sensitive"] else lowered
+                text_len = len(text_to_check)
+                # A trigger longer than the message can never be contained in it, so skip the substring scan
+                if entry["_min_trigger_len"] > text_len:
+                    continue
+                if any(len(trigger) <= text_len and trigger in text_to_check for trigger in entry["_triggers"]):
+                    matched.append(rule_idx)
+                    break
+
+        return self.auto_responses[min(matched)] if matched else None
+
+    def _loaded_cogs_text(self) -> str:
+        """Returns the loaded-cogs reply, reusing the cached text while the loaded extensions are unchanged."""
+        extensions = getattr(self.bot, 'extensions', None)
+        if not extensions:
+            return "⚠️ Could not retrieve the list of loaded cogs at the moment."
+        key = tuple(extensions)
+        if key != self._cached_cogs_key:
+            cog_names = [name.split('.')[-1] for name in key]
+            self._cached_cogs_str = f"✅ Currently loaded cogs: `{', '.join(sorted(cog_names))}`."
+            self._cached_cogs_key = key
+        return self._cached_cogs_str
 
     async def cog_check(self, interaction: Interaction) -> bool:
         # Cog check for slash commands: ensure they are used in the target guild if bot is single-server configured
@@ -68,68 +208,45 @@ class AutoResponderCog(commands.Cog, name="Auto Responder"):
                 return False
         return True
 
-    @commands.Cog.listener()
-    async def on_message(self, message: nextcord.Message):
-        if message.author.bot:
+    async def handle_message(self, message: nextcord.Message):
+        """Sends the first matching auto-response. Dispatched by MessageRouterCog for non-bot guild messages."""
+        if not self.auto_responses:
             return
-        
+
         # For single-server bot, ensure message is from the target guild
-        if hasattr(self.bot, 'target_guild_id') and self.bot.target_guild_id:
-            if message.guild is None or message.guild.id != self.bot.target_guild_id:
-                return 
+        target_guild_id = self._target_guild_id
+        guild = message.guild
+        if target_guild_id and (guild is None or guild.id != target_guild_id):
+            return
 
         msg_content = message.content
-        
-        for entry in self.auto_responses:
-            triggers: List[str] = entry.get("triggers", [])
-            response_text: Optional[str] = entry.get("response")
-            case_sensitive: bool = entry.get("case_sensitive", False) 
-            match_type: str = entry.get("match_type", "exact") 
-
-            if not response_text or not triggers:
-                continue
+        entry = self._find_rule(msg_content)
+        if entry is None:
+            return
 
-            text_to_check = msg_content if case_sensitive else msg_content.lower()
-            triggered = False
+        response_text: str = entry["response"]
+        author = message.author
 
-            for trigger in triggers:
-                current_trigger = trigger if case_sensitive else trigger.lower()
-                if match_type == "exact":
-                    if text_to_check == current_trigger:
-                        triggered = True
-                        break
-                elif match_type == "contains":
-                    if current_trigger in text_to_check:
-                        triggered = True
-                        break
-                # Can add more match_types here like "startswith", "endswith"
-            
-            if triggered:
-                final_response_message = ""
-
-                if response_text == "{loaded_cogs_list}":
-                    if hasattr(self.bot, 'extensions') and self.bot.extensions:
-                        cog_names = [name.split('.')[-1] for name in self.bot.extensions.keys()]
-                        if cog_names:
-                            final_response_message = f"✅ Currently loaded cogs: `{', '.join(sorted(cog_names))}`."
-                        else:
-                            final_response_message = "🤔 No cogs appear to be loaded (which is strange if this one is running!)."
-                    else:
-                        final_response_message = "⚠️ Could not retrieve the list of loaded cogs at the moment."
-                else:
-                    final_response_message = response_text.replace("{user_mention}", message.author.mention)
-                    final_response_message = final_response_message.replace("{user_name}", message.author.name)
-                    final_response_message = final_response_message.replace("{user_display_name}", message.author.display_name)
-                
-                try:
-                    if final_response_message: # Ensure there's something to send
-                        await message.channel.send(final_response_message)
-                        logging.info(f"AutoResponderCog: Responded to '{msg_content}' from {message.author.name} in {message.channel.name}.")
-                except nextcord.Forbidden:
-                    logging.warning(f"AutoResponderCog: Missing permissions to send auto-response in channel {message.channel.id} for guild {message.guild.id if message.guild else 'DM'}")
-                except Exception as e:
-                    logging.error(f"AutoResponderCog: Error sending auto-response: {e}", exc_info=True)
-                return # Stop processing further auto-responses for this message
+        if response_text == "{loaded_cogs_list}":
+            final_response_message = self._loaded_cogs_text()
+        elif '{' in response_text:
+            placeholders = {
+                "user_mention": author.mention,
+                "user_name": author.name,
+                "user_display_name": author.display_name,
+            }
+            final_response_message = _PLACEHOLDER_RE.sub(lambda m: placeholders[m.group(1)], response_text)
+        else:
+            final_response_message = response_text
+        
+        try:
+            if final_response_message: # Ensure there's something to send
+                await message.channel.send(final_response_message)
+                logging.info(f"AutoResponderCog: Responded to '{msg_content}' from {author.name} in {message.channel.name}.")
+        except nextcord.Forbidden:
+            logging.warning(f"AutoResponderCog: Missing permissions to send auto-response in channel {message.channel.id} for guild {guild.id if guild else 'DM'}")
+        except Exception as e:
+            logging.error(f"AutoResponderCog: Error sending auto-response: {e}", exc_info=True)
 
     @nextcord.slash_command(name="reload_autoresponses", description="Reloads auto-response phrases from the JSON file (Admin).")
     @application_checks.has_permissions(manage_guild=True) 
@@ -2,7 +2,14 @@ import nextcord
 from nextcord.ext import commands, tasks, application_checks
 from nextcord import Interaction, SlashOption, Embed, Color, Member, Role, TextChannel, Webhook
 import logging
+import asyncio
+import bisect
+import concurrent.futures
+import functools
+import string
+import time
 from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
 import aiohttp
 
 from db_utils import booster_database as db
@@ -16,7 +23,13 @@ if not logger.handlers:
 logger.setLevel(logging.INFO)  # Or DEBUG for more verbosity
 
 NITRO_PINK = Color(0xf47fff)
+CONFIG_CACHE_TTL = 60  # Seconds a guild's cog_config row is served from memory
+WEBHOOK_CONNECTION_LIMIT = 20  # Pooled keep-alive connections for announcement webhooks
+WEBHOOK_TIMEOUT = 10  # Seconds before a webhook request is abandoned
+DEFAULT_WELCOME_TEMPLATE = "Thank you {mention} for boosting {server}! 🚀"
+DEFAULT_ANNIVERSARY_TEMPLATE = "{mention} has been boosting for {months} {month_label}!"
 
+@functools.lru_cache(maxsize=1024)
 def format_duration(total_days: int) -> str:
     """Formats a duration in days into a more readable string like '1 year, 2 months'."""
     if total_days is None or total_days < 0:
@@ -29,18 +42,54 @@ def format_duration(total_days: int) -> str:
 
     parts = []
     if years > 0:
-        parts.append(f"{years} year{'s' if years != 1 else ''}")
+        parts.append(f"{years} {('year', 'years')[years != 1]}")
     if months > 0:
-        parts.append(f"{months} month{'s' if months != 1 else ''}")
+        parts.append(f"{months} {('month', 'months')[months != 1]}")
     
     if years == 0 and days > 0:
-        parts.append(f"{days} day{'s' if days != 1 else ''}")
+        parts.append(f"{days} {('day', 'days')[days != 1]}")
     
     if not parts:
         return "Less than a day" if total_days > 0 else "0 days"
         
     return ", ".join(parts)
 
+def total_boost_days(booster: dict, now_ts: int) -> int:
+    """A booster's stored total duration plus the days elapsed in their current streak, using plain integer math."""
+    days = booster.get('total_duration_days', 0)
+    start_ts = booster.get('current_boost_start_timestamp')
+    if booster.get('is_currently_boosting') and start_ts:
+        days += (now_ts - start_ts) // 86400
+    return days
+
+def months_between(start_ts: int, now_year: int, now_month: int, now_day: int) -> int:
+    """Whole calendar months from a UTC start timestamp to the given date, counting a month only once its day is reached."""
+    start = time.gmtime(start_ts)
+    months = (now_year - start.tm_year) * 12 + (now_month - start.tm_mon)
+    if now_day < start.tm_mday:
+        months -= 1
+    return months
+
+@functools.lru_cache(maxsize=32)
+def _compile_template(template: str) -> Optional[Tuple[Tuple[str, Optional[str]], ...]]:
+    """Splits a message template into (literal, field_name) pairs once. Returns None for templates using
+    format specs, conversions or attribute/index access, which are left to str.format_map."""
+    parts = []
+    for literal, field_name, format_spec, conversion in string.Formatter().parse(template):
+        if field_name is not None and (format_spec or conversion or not field_name.isidentifier()):
+            return None
+        parts.append((literal, field_name))
+    return tuple(parts)
+
+def format_anniversary(template: str, context: Dict[str, Any]) -> str:
+    """Renders an anniversary template, with a direct path for the default one."""
+    if template == DEFAULT_ANNIVERSARY_TEMPLATE:
+        return f"{context['mention']} has been boosting for {context['months']} {context['month_label']}!"
+    parts = _compile_template(template)
+    if parts is None:
+        return template.format_map(context)
+    return "".join(literal + (str(context[field]) if field is not None else "") for literal, field in parts)
+
 
 class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
     def __init__(self, bot: commands.Bot):
@@ -50,31 +99,148 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
         self.check_boosters_task.start()
         self.sync_boosters_task.start()
         self.initial_scan_done = False
+        self._initial_scan_lock = asyncio.Lock()
+        # Shared HTTP session for webhook announcements, created lazily inside the running event loop
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        self._webhooks: Dict[str, Webhook] = {}
+        self._config_cache: Dict[str, Tuple[float, dict]] = {}  # guild_id -> (fetched_at, config)
+        # All SQLite work runs on one worker thread, so writes keep their order and stay off the event loop
+        self._db_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="boosterdb")
 
     def cog_unload(self):
         self.check_boosters_task.cancel()
+        self.sync_boosters_task.cancel()
+        if self._http_session and not self._http_session.closed:
+            asyncio.create_task(self._http_session.close())
+        self._webhooks.clear()
+        self._db_executor.shutdown(wait=False)
+
+    async def _run_db(self, fn: Callable[..., Any], *args) -> Any:
+        """Runs a blocking db_utils call on the cog's database thread."""
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, fn, *args)
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Returns the cog's shared HTTP session, opening a new one if it hasn't been created yet or was closed."""
+        if self._http_session is None or self._http_session.closed:
+            self._http_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=WEBHOOK_CONNECTION_LIMIT, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=WEBHOOK_TIMEOUT),
+            )
+            self._webhooks.clear()
+        return self._http_session
+
+    def _get_webhook(self, url: str) -> Webhook:
+        """Returns a Webhook bound to the cog's shared session, reusing one per URL."""
+        session = self._get_session()
+        webhook = self._webhooks.get(url)
+        # A cached Webhook bound to an older, closed session would fail on send, so rebuild it
+        if webhook is None or webhook.session is not session:
+            webhook = Webhook.from_url(url, session=session)
+            self._webhooks[url] = webhook
+        return webhook
+
+    async def _get_config(self, guild_id: str) -> dict:
+        """Returns the guild's booster config, re-reading the database at most once per CONFIG_CACHE_TTL."""
+        cached = self._config_cache.get(guild_id)
+        if cached and time.monotonic() - cached[0] < CONFIG_CACHE_TTL:
+            return cached[1]
+        config = await self._run_db(db.get_config, guild_id)
+        self._config_cache[guild_id] = (time.monotonic(), config)
+        return config
+
+    async def _update_config(self, guild_id: str, updates: dict):
+        await self._run_db(db.update_config, guild_id, updates)
+        self._config_cache.pop(guild_id, None)
+
+    async def _cache_missing_members(self, guild: nextcord.Guild, user_ids: List[int]):
+        """Loads the given members into the guild cache with gateway queries of up to 100 ids each."""
+        for i in range(0, len(user_ids), 100):
+            batch = user_ids[i:i + 100]
+            try:
+                await guild.query_members(user_ids=batch, limit=len(batch), cache=True)
+            except Exception as e:
+                logger.warning(f"Could not query {len(batch)} members: {e}")
+
+    async def _announce(self, guild_id: str, content: str, label: str = "Booster announcement") -> bool:
+        """Posts a booster announcement via the configured webhook, or the fallback channel if no webhook is set."""
+        config = await self._get_config(guild_id)
+        webhook_url = config.get("booster_announcement_webhook_url")
+        if webhook_url:
+            logger.info("Attempting to send %s via webhook.", label.lower())
+            try:
+                await self._get_webhook(webhook_url).send(content)
+                logger.info("%s sent via webhook.", label)
+                return True
+            except Exception as e:
+                logger.error("Failed to send %s webhook: %s", label.lower(), e)
+                return False
+        channel_id = config.get("announcement_channel_id")
+        if channel_id and (channel := self.bot.get_channel(int(channel_id))):
+            try:
+                await channel.send(content)
+                logger.info("%s sent via fallback channel.", label)
+                return True
+            except Exception as e:
+                logger.error("Failed to send %s to channel %s: %s", label.lower(), channel_id, e)
+        return False
+
+    def _resolve_reward_roles(self, guild: nextcord.Guild, reward_roles: List[dict]) -> List[Tuple[int, Role]]:
+        """Looks up each configured reward role once, returning (duration_months, role) pairs sorted by milestone."""
+        resolved = []
+        for reward in reward_roles:
+            role = guild.get_role(int(reward['role_id']))
+            if role:
+                resolved.append((reward['duration_months'], role))
+            else:
+                logger.warning(f"Role ID {reward['role_id']} not found in guild.")
+        resolved.sort(key=lambda pair: pair[0])
+        return resolved
+
+    async def _grant_reward_role(self, member: Member, role: Role, milestone: int, months_boosted: int) -> bool:
+        try:
+            await member.add_roles(role, reason=f"Reached {milestone} months of boosting.")
+            logger.info(f"Gave {role.name} to {member.display_name} for {months_boosted} months of boosting.")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to assign role to {member.display_name}: {e}")
+            return False
 
     # --- EVENT LISTENERS ---
 
     @commands.Cog.listener()
     async def on_ready(self):
         if self.initial_scan_done: return
-        await self.bot.wait_until_ready()
-        guild = self.bot.get_guild(self.target_guild_id)
-        if not guild:
-            logger.error(f"Initial booster scan: Target guild {self.target_guild_id} not found.")
-            return
-        
-        logger.info("Performing initial scan for existing boosters...")
-        async for member in guild.fetch_members(limit=None):
-            if member.premium_since is not None:
-                booster_data = db.get_booster(str(member.id))
-                if not booster_data or not booster_data.get('is_currently_boosting'):
-                    # IMPORTANT: Ensure your start_new_boost function does NOT increment the boost count.
-                    db.start_new_boost(str(member.id), str(guild.id), int(member.premium_since.timestamp()))
-        self.initial_scan_done = True
-        logger.info("Initial booster scan complete. Running first monthly count update.")
-        await self.check_boosters_task.coro(self)
+        # on_ready fires again on every reconnect; the lock keeps overlapping calls from scanning twice
+        async with self._initial_scan_lock:
+            if self.initial_scan_done: return
+            await self.bot.wait_until_ready()
+            guild = self.bot.get_guild(self.target_guild_id)
+            if not guild:
+                logger.error(f"Initial booster scan: Target guild {self.target_guild_id} not found.")
+                return
+            
+            logger.info("Performing initial scan for existing boosters...")
+            if self.bot.intents.members:
+                # Use the gateway member cache instead of paging through the REST member list
+                if not guild.chunked:
+                    await guild.chunk(cache=True)
+                # The booster role's member list is just the boosters, rather than every member of the guild
+                booster_role = guild.premium_subscriber_role
+                members = booster_role.members if booster_role else guild.members
+            else:
+                members = [member async for member in guild.fetch_members(limit=None)]
+
+            # One read for who is already tracked as boosting, one transaction for everyone new
+            already_boosting = {b['user_id'] for b in await self._run_db(db.get_active_boosters)}
+            new_boosts = [
+                (str(member.id), str(guild.id), int(member.premium_since.timestamp()))
+                for member in members
+                if member.premium_since is not None and str(member.id) not in already_boosting
+            ]
+            # IMPORTANT: start_new_boosts does NOT increment the boost count.
+            await self._run_db(db.start_new_boosts, new_boosts)
+            self.initial_scan_done = True
+            logger.info("Initial booster scan complete.")
 
     @commands.Cog.listener()
     async def on_member_update(self, before: Member, after: Member):
@@ -82,53 +248,37 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
         now_ts = int(datetime.now(timezone.utc).timestamp())
         if before.premium_since is None and after.premium_since is not None:
             # IMPORTANT: Ensure this function does NOT increment the boost count itself.
-            db.start_new_boost(str(after.id), str(after.guild.id), int(after.premium_since.timestamp()))
+            await self._run_db(db.start_new_boost, str(after.id), str(after.guild.id), int(after.premium_since.timestamp()))
         elif before.premium_since is not None and after.premium_since is None:
-            db.end_boost(str(after.id), now_ts)
+            await self._run_db(db.end_boost, str(after.id), now_ts)
             
     # ADDED: Listener for boost messages to accurately count boosts
     @commands.Cog.listener()
     async def on_message(self, message: nextcord.Message):
         """Listen for official boost messages to increment the count and send announcements."""
+        # Cheapest check first: almost no message is a server boost message
+        if message.type is not nextcord.MessageType.premium_guild_subscription:
+            return
         if not message.guild or message.guild.id != self.target_guild_id:
             return
-        
-        # Check if the message is a server boost message
-        if message.type == nextcord.MessageType.premium_guild_subscription:
-            booster = message.author
-            if not isinstance(booster, Member): return
-
-            logger.info(f"Detected boost message from {booster.name}. Incrementing count.")
-            # Increment the boost count by 1 for this event
-            db.increment_boost_count(str(booster.id), 1)
-
-            # --- Send Welcome Message for New Boost ---
-            config = db.get_config(str(message.guild.id))
-            webhook_url = config.get("booster_announcement_webhook_url")
-            template = config.get("welcome_message_template", "Thank you {mention} for boosting {server}! 🚀")
-            rate = config.get("keys_per_month", 1) # Default to 1 if not set
-            db.add_claimed_keys(str(message.author.id), rate)
-
-            content = template.format(
-                mention=booster.mention,
-                user=booster.name,
-                server=message.guild.name
-            )
-            
-            if webhook_url:
-                logger.info(f"Attempting to send welcome message via webhook: {webhook_url}")
-                async with aiohttp.ClientSession() as session:
-                    try:
-                        webhook = Webhook.from_url(webhook_url, session=session)
-                        await webhook.send(content)
-                        logger.info("Welcome message sent via webhook.")
-                    except Exception as e:
-                        logger.error(f"Failed to send welcome webhook: {e}")
-            else:
-                channel_id = config.get("announcement_channel_id")
-                if channel_id and (channel := self.bot.get_channel(int(channel_id))):
-                    await channel.send(content)
-                    logger.info("Welcome message sent via fallback channel.")
+
+        booster = message.author
+        if not isinstance(booster, Member): return
+
+        logger.info(f"Detected boost message from {booster.name}. Incrementing count.")
+        config = await self._get_config(str(message.guild.id))
+        rate = config.get("keys_per_month", 1) # Default to 1 if not set
+        # Increment the boost count by 1 for this event and grant its keys in one write
+        await self._run_db(db.bump_boost_and_keys, str(booster.id), 1, rate)
+
+        # --- Send Welcome Message for New Boost ---
+        template = config.get("welcome_message_template", DEFAULT_WELCOME_TEMPLATE)
+        content = template.format(
+            mention=booster.mention,
+            user=booster.name,
+            server=message.guild.name
+        )
+        await self._announce(str(message.guild.id), content, "Welcome message")
 
     # --- TASKS ---
 
@@ -145,25 +295,31 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
             logger.error("Server Booster role not found for booster sync.")
             return
 
-        boosters_in_guild = set(member.id for member in booster_role.members)
-        db_boosters = set(int(b['user_id']) for b in db.get_all_boosters_for_leaderboard() if b.get('is_currently_boosting'))
+        members_by_id = {member.id: member for member in booster_role.members}
+        db_boosters = set(int(b['user_id']) for b in await self._run_db(db.get_active_boosters))
 
         # Mark as not boosting in DB if not in role
-        for user_id in db_boosters - boosters_in_guild:
-            db.end_boost(str(user_id), int(datetime.now(timezone.utc).timestamp()))
-            logger.info(f"Marked user {user_id} as not boosting (sync task).")
+        now_ts = int(datetime.now(timezone.utc).timestamp())
+        ended = [(str(user_id), now_ts) for user_id in db_boosters if user_id not in members_by_id]
 
         # Mark as boosting in DB if in role but not in DB
-        for user_id in boosters_in_guild - db_boosters:
-            member = guild.get_member(user_id)
-            if member and member.premium_since:
-                db.start_new_boost(str(user_id), str(guild.id), int(member.premium_since.timestamp()))
-                logger.info(f"Marked user {user_id} as boosting (sync task).")
+        started = [
+            (str(user_id), str(guild.id), int(member.premium_since.timestamp()))
+            for user_id, member in members_by_id.items()
+            if user_id not in db_boosters and member.premium_since
+        ]
+
+        # Both sides of the sync are written in one transaction
+        await self._run_db(db.bulk_sync_boosters, ended, started)
+        for user_id, _ in ended:
+            logger.info(f"Marked user {user_id} as not boosting (sync task).")
+        for user_id, _, _ in started:
+            logger.info(f"Marked user {user_id} as boosting (sync task).")
 
         logger.info(
             f"Booster sync complete. "
-            f"Marked {len(db_boosters - boosters_in_guild)} as not boosting, "
-            f"{len(boosters_in_guild - db_boosters)} as boosting."
+            f"Marked {len(ended)} as not boosting, "
+            f"{len(started)} as boosting."
         )
     
     @tasks.loop(hours=1)
@@ -173,26 +329,42 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
         if not guild: return
 
         logger.info("Running daily check for monthly booster count updates...")
-        active_boosters = [b for b in db.get_all_boosters_for_leaderboard() if b.get('is_currently_boosting')]
+        active_boosters = await self._run_db(db.get_active_boosters)
         now = datetime.now(timezone.utc)
-        config = db.get_config(str(guild.id))
+        now_year, now_month, now_day = now.year, now.month, now.day
+        config = await self._get_config(str(guild.id))
 
         # Get the role ID and month threshold from config
-        reward_roles = db.get_all_reward_roles()  # List of dicts: {'duration_months': int, 'role_id': str}
+        reward_roles = await self._run_db(db.get_all_reward_roles)  # List of dicts: {'duration_months': int, 'role_id': str}
         if not reward_roles:
             logger.info("No reward roles configured.")
             return
 
+        resolved_rewards = self._resolve_reward_roles(guild, reward_roles)
+        milestones = [milestone for milestone, _ in resolved_rewards]
+
+        # Fill the member cache over the gateway if it isn't already, then pull any boosters still missing in bulk
+        if self.bot.intents.members and not guild.chunked:
+            await guild.chunk(cache=True)
+        await self._cache_missing_members(guild, [
+            int(b['user_id']) for b in active_boosters
+            if b.get('current_boost_start_timestamp') and guild.get_member(int(b['user_id'])) is None
+        ])
+
+        rate = config.get("keys_per_month", 1)
+        template = config.get("anniversary_message_template", DEFAULT_ANNIVERSARY_TEMPLATE)
+        guild_id_str = str(guild.id)
+
+        anniversary_updates = [] # (user_id, keys, months) written in one transaction after the loop
+        announcements = [] # Anniversary message contents, sent once the anniversaries are recorded
+        grants = [] # (member, role, milestone, months) reward role grants, dispatched with the announcements
         for booster_data in active_boosters:
             user_id = str(booster_data['user_id'])
             start_ts = booster_data.get('current_boost_start_timestamp')
             if not start_ts:
                 continue
 
-            boost_start = datetime.fromtimestamp(start_ts, tz=timezone.utc)
-            months_boosted = (now.year - boost_start.year) * 12 + (now.month - boost_start.month)
-            if now.day < boost_start.day:
-                months_boosted -= 1
+            months_boosted = months_between(start_ts, now_year, now_month, now_day)
 
             # Skip if less than 1 month
             if months_boosted < 1:
@@ -200,63 +372,45 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
 
             member = guild.get_member(int(user_id))
             if not member:
-                try:
-                    member = await guild.fetch_member(int(user_id))
-                except Exception:
-                    logger.warning(f"Could not fetch member {user_id}")
-                    continue
+                logger.warning(f"Could not fetch member {user_id}")
+                continue
 
             # Check if we need to send anniversary message
             last_notified = booster_data.get('last_anniversary_notified', 0)
             if months_boosted > last_notified:
-                rate = config.get("keys_per_month", 1)
-                db.add_claimed_keys(user_id, rate)
-                db.increment_boost_count(user_id, 1)
+                anniversary_updates.append((user_id, rate, months_boosted))
                 # Send anniversary message
-                template = config.get("anniversary_message_template", "{mention} has been boosting for {months} {month_label}!")
                 month_label = "month" if months_boosted == 1 else "months"
-                content = template.format(
-                    mention=member.mention,
-                    user=member.name,
-                    server=guild.name,
-                    months=months_boosted,
-                    month_label=month_label
-                )
+                content = format_anniversary(template, {
+                    'mention': member.mention,
+                    'user': member.name,
+                    'server': guild.name,
+                    'months': months_boosted,
+                    'month_label': month_label,
+                })
                 
-                webhook_url = config.get("booster_announcement_webhook_url")
-                if webhook_url:
-                    logger.info(f"Attempting to send anniversary message via webhook for {member.name}")
-                    async with aiohttp.ClientSession() as session:
-                        try:
-                            webhook = Webhook.from_url(webhook_url, session=session)
-                            await webhook.send(content)
-                            logger.info("Anniversary message sent via webhook.")
-                        except Exception as e:
-                            logger.error(f"Failed to send anniversary webhook: {e}")
-                else:
-                    channel_id = config.get("announcement_channel_id")
-                    if channel_id and (channel := self.bot.get_channel(int(channel_id))):
-                        await channel.send(content)
-                        logger.info("Anniversary message sent via fallback channel.")
-                
-                # Update the last notified milestone
-                db.update_anniversary_notified(user_id, months_boosted)
-
-            # Assign roles
-            for reward in reward_roles:
-                milestone = reward['duration_months']
-                role = guild.get_role(int(reward['role_id']))
-                if not role:
-                    logger.warning(f"Role ID {reward['role_id']} not found in guild.")
+                announcements.append(content)
+
+            # Assign roles. resolved_rewards is ordered by milestone, so the reached ones are a prefix
+            member_role_ids = {r.id for r in member.roles}
+            for milestone, role in resolved_rewards[:bisect.bisect_right(milestones, months_boosted)]:
+                if role.id in member_role_ids:
                     continue
-                
-                if months_boosted >= milestone and role not in member.roles:
-                    try:
-                        await member.add_roles(role, reason=f"Reached {milestone} months of boosting.")
-                        logger.info(f"Gave {role.name} to {member.display_name} for {months_boosted} months of boosting.")
-                    except Exception as e:
-                        logger.error(f"Failed to assign role to {member.display_name}: {e}")
-                        
+                # Mark it as held now so a role configured for several milestones is only granted once
+                member_role_ids.add(role.id)
+                grants.append((member, role, milestone, months_boosted))
+
+        # Boost count, keys and last notified milestone for every anniversary in this run.
+        # Recorded before anything is sent, so an interrupted run can't announce or pay out keys twice
+        await self._run_db(db.record_anniversaries, anniversary_updates)
+
+        # Let the Discord round-trips for every booster overlap instead of awaiting them one by one
+        await asyncio.gather(
+            *(self._announce(guild_id_str, content, "Anniversary message") for content in announcements),
+            *(self._grant_reward_role(*grant) for grant in grants),
+            return_exceptions=True,
+        )
+
     # --- COMMANDS ---
 
     @nextcord.slash_command(name="boost", description="User booster info and leaderboard.")
@@ -275,32 +429,26 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
             },
             default="count"
         )):
-        all_boosters_data = db.get_all_boosters_for_leaderboard()
-        if not all_boosters_data:
-            return await interaction.send("There are no boosters to display.", ephemeral=True)
         now = datetime.now(timezone.utc)
-        def get_true_total_duration(b):
-            days = b.get('total_duration_days', 0)
-            if b.get('is_currently_boosting') and b.get('current_boost_start_timestamp'):
-                start = datetime.fromtimestamp(b.get('current_boost_start_timestamp'), tz=timezone.utc)
-                days += (now - start).days
-            return days
+        # Ordering and the top-20 cut happen in SQL, so only the displayed rows are loaded
         if sort_by == "streak":
-            active_boosters = [b for b in all_boosters_data if b.get('is_currently_boosting')]
-            sorted_boosters = sorted(active_boosters, key=lambda b: b.get('current_boost_start_timestamp') or 0)
+            top_boosters = await self._run_db(db.leaderboard_by_streak, 20)
             title = "Booster Leaderboard (Current Streak)"
         elif sort_by == "count":
-            sorted_boosters = sorted(all_boosters_data, key=lambda b: b.get('total_boost_count', 0), reverse=True)
+            top_boosters = await self._run_db(db.leaderboard_by_count, 20)
             title = "Booster Leaderboard (Total Boost Count)"
         else: # duration
-            sorted_boosters = sorted(all_boosters_data, key=get_true_total_duration, reverse=True)
+            top_boosters = await self._run_db(db.leaderboard_by_duration, int(now.timestamp()), 20)
             title = "Booster Leaderboard (Total Duration)"
+        if not top_boosters and sort_by != "streak":
+            return await interaction.send("There are no boosters to display.", ephemeral=True)
         embed = Embed(title=title, color=NITRO_PINK, timestamp=now)
-        description = ""
-        for i, booster_data in enumerate(sorted_boosters[:20], 1):
-            user = self.bot.get_user(int(booster_data['user_id']))
-            if not user: continue
-            display_str = ""
+        # Resolve the displayed users once, dropping anyone no longer in the bot's user cache
+        get_user = self.bot.get_user
+        resolved = [(b, get_user(int(b['user_id']))) for b in top_boosters]
+        resolved = [(b, user) for b, user in resolved if user is not None]
+        lines = []
+        for i, (booster_data, user) in enumerate(resolved, 1):
             if sort_by == 'streak':
                 start_ts = booster_data.get('current_boost_start_timestamp')
                 if start_ts: display_str = f"Boosting since: <t:{start_ts}:D>"
@@ -308,30 +456,24 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
             elif sort_by == 'count':
                 display_str = f"Boost Count: `{booster_data.get('total_boost_count', 0)}`"
             else: # duration
-                total_days = get_true_total_duration(booster_data)
-                display_str = f"Total duration: `{format_duration(total_days)}`"
-            line = f"**{i}.** {user.mention} - {display_str}\n"
+                display_str = f"Total duration: `{format_duration(booster_data['total_days'])}`"
+            line = f"**{i}.** {user.mention} - {display_str}"
             if not booster_data.get('is_currently_boosting'):
-                line = f"~~{line.strip()}~~\n"
-            description += line
-        if not description: description = "No boosters to display for this category."
-        embed.description = description
+                line = f"~~{line}~~"
+            lines.append(line)
+        embed.description = "\n".join(lines) or "No boosters to display for this category."
         await interaction.send(embed=embed)
 
     @boost_group.subcommand(name="status", description="View the boost status of a specific user.")
     async def history(self, interaction: Interaction, user: Member = SlashOption(description="The user to check.")):
-        booster_stats = db.get_booster(str(user.id))
+        booster_stats = await self._run_db(db.get_booster, str(user.id))
         if not booster_stats:
             return await interaction.send(f"{user.display_name} has no boosting history.", ephemeral=False)
         embed = Embed(title=f"{user.display_name}'s Boost Status", color=NITRO_PINK)
         embed.set_thumbnail(url=user.display_avatar.url)
         total_boosts = booster_stats.get('total_boost_count', 0)
         first_boost_ts = booster_stats.get('first_boost_timestamp')
-        now = datetime.now(timezone.utc)
-        total_days = booster_stats.get('total_duration_days', 0)
-        if booster_stats.get('is_currently_boosting') and booster_stats.get('current_boost_start_timestamp'):
-            current_start = datetime.fromtimestamp(booster_stats.get('current_boost_start_timestamp'), tz=timezone.utc)
-            total_days += (now - current_start).days
+        total_days = total_boost_days(booster_stats, int(time.time()))
 
         boost_status = "**Active**" if booster_stats.get('is_currently_boosting') else "**Inactive**"
         claimed_keys = booster_stats.get('claimed_keys', 0)
@@ -362,7 +504,7 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
     @booster_group.subcommand(name="reward", description="Add or deduct claimed reward keys to a booster.")
     @application_checks.has_permissions(manage_guild=True)
     async def reward(self, interaction: Interaction, user: Member = SlashOption(description="The user to add/deduct keys for."), amount: int = SlashOption(description="Number of keys to add (use negative to deduct).")):
-        booster_stats = db.get_booster(str(user.id))
+        booster_stats = await self._run_db(db.get_booster, str(user.id))
         if not booster_stats:
             return await interaction.send(f"{user.display_name} has no boosting history.", ephemeral=True)
 
@@ -377,14 +519,14 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
                 return await interaction.send(
                     f"Cannot add {amount} keys. Only {available_keys} available for {user.display_name}.", ephemeral=True
                 )
-            db.add_claimed_keys(str(user.id), amount)
+            await self._run_db(db.add_claimed_keys, str(user.id), amount)
             await interaction.send(f"Added {amount} key(s) to {user.display_name}.", ephemeral=True)
         else:  # amount < 0
             if abs(amount) > claimed_keys:
                 return await interaction.send(
                     f"Cannot deduct {abs(amount)} keys. {user.display_name} only has {claimed_keys} claimed.", ephemeral=True
                 )
-            db.add_claimed_keys(str(user.id), amount)  # amount is negative
+            await self._run_db(db.add_claimed_keys, str(user.id), amount)  # amount is negative
             await interaction.send(f"Deducted {abs(amount)} key(s) from {user.display_name}.", ephemeral=True)
         
     # --- CONFIG GROUP ---
@@ -399,14 +541,15 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
         await interaction.response.defer(ephemeral=True)
         
         # 1. Get configuration for the current key rate
-        config = db.get_config(str(interaction.guild.id))
+        config = await self._get_config(str(interaction.guild.id))
         keys_per_month = config.get("keys_per_month", 1)
         
-        active_boosters = [b for b in db.get_all_boosters_for_leaderboard() if b.get('is_currently_boosting')]
+        active_boosters = await self._run_db(db.get_active_boosters)
         updated_users = 0
         total_keys_granted = 0
 
         now = datetime.now(timezone.utc)
+        now_year, now_month, now_day = now.year, now.month, now.day
 
         for booster in active_boosters:
             user_id = booster['user_id']
@@ -414,10 +557,7 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
             if not start_ts: continue
 
             # Calculate actual months boosted from timestamp
-            boost_start = datetime.fromtimestamp(start_ts, tz=timezone.utc)
-            actual_months = (now.year - boost_start.year) * 12 + (now.month - boost_start.month)
-            if now.day < boost_start.day:
-                actual_months -= 1
+            actual_months = months_between(start_ts, now_year, now_month, now_day)
 
             # Determine the difference between actual months and recorded data
             current_recorded_count = booster.get('total_boost_count', 0)
@@ -426,9 +566,8 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
                 diff = actual_months - current_recorded_count
                 
                 # Update the database
-                db.increment_boost_count(user_id, diff)
-                db.add_claimed_keys(user_id, diff * keys_per_month)
-                db.update_anniversary_notified(user_id, actual_months)
+                await self._run_db(db.bump_boost_and_keys, user_id, diff, diff * keys_per_month)
+                await self._run_db(db.update_anniversary_notified, user_id, actual_months)
                 
                 updated_users += 1
                 total_keys_granted += (diff * keys_per_month)
@@ -443,20 +582,14 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
     @config_group.subcommand(name="set_key_rate", description="Set how many keys a user gets per month of boosting.")
     @application_checks.has_permissions(manage_guild=True)
     async def set_key_rate(self, interaction: Interaction, amount: int = SlashOption(description="Amount of keys per month", min_value=0)):
-        # The table 'cog_config' uses 'config_id' to store the Guild ID
-        with db.get_db_connection() as conn:
-            conn.cursor().execute(
-                "UPDATE cog_config SET keys_per_month = ? WHERE config_id = ?",
-                (amount, str(interaction.guild.id))
-            )
-            conn.commit()
-        
+        # update_config also creates the guild's cog_config row if it doesn't exist yet
+        await self._update_config(str(interaction.guild.id), {'keys_per_month': amount})
         await interaction.send(f"✅ Key exchange rate updated to **{amount}** keys per month.", ephemeral=True)
 
     @config_group.subcommand(name="channel", description="Sets the channel for all boost-related announcements.")
     @application_checks.has_permissions(manage_guild=True)
     async def set_channel(self, interaction: Interaction, channel: TextChannel):
-        db.update_config(str(interaction.guild.id), {'announcement_channel_id': str(channel.id)})
+        await self._update_config(str(interaction.guild.id), {'announcement_channel_id': str(channel.id)})
         await interaction.send(f"Booster announcement channel set to {channel.mention}.", ephemeral=True)
 
     # ADDED: Command to set the webhook URL
@@ -465,7 +598,7 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
     async def set_webhook(self, interaction: Interaction, url: str):
         if not url.startswith("https://discord.com/api/webhooks/"):
             return await interaction.send("This does not look like a valid Discord webhook URL.", ephemeral=True)
-        db.update_config(str(interaction.guild.id), {'booster_announcement_webhook_url': url})
+        await self._update_config(str(interaction.guild.id), {'booster_announcement_webhook_url': url})
         await interaction.send(f"Booster announcement webhook has been set.", ephemeral=True)
 
     @config_group.subcommand(name="message", description="Sets the custom message for new boosters or the monthly anniversary.")
@@ -474,21 +607,21 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
                           msg_type: str = SlashOption(name="type", choices=["welcome", "anniversary"]),
                           template: str = SlashOption(name="template")):
         # You can use placeholders: {mention}, {user}, {server}, and {months} for anniversary messages
-        db.update_config(str(interaction.guild.id), {f'{msg_type}_message_template': template})
+        await self._update_config(str(interaction.guild.id), {f'{msg_type}_message_template': template})
         await interaction.send(f"Booster {msg_type} message updated.", ephemeral=True)
 
     @config_group.subcommand(name="add_reward_role", description="Adds a new role reward for a duration milestone.")
     @application_checks.has_permissions(manage_guild=True)
     async def add_reward(self, interaction: Interaction, months: int, role: Role):
         # ... (This command remains unchanged) ...
-        db.add_reward_role(months, str(role.id))
+        await self._run_db(db.add_reward_role, months, str(role.id))
         await interaction.send(f"Role {role.mention} will be given for {months} months of continuous boosting.", ephemeral=True)
 
     @config_group.subcommand(name="remove_reward_role", description="Removes a role reward.")
     @application_checks.has_permissions(manage_guild=True)
     async def remove_reward(self, interaction: Interaction, role: Role):
         # ... (This command remains unchanged) ...
-        db.remove_reward_role(str(role.id))
+        await self._run_db(db.remove_reward_role, str(role.id))
         await interaction.send(f"Role reward for {role.mention} has been removed.", ephemeral=True)
 
     # ADDED: Command to view all current configurations
@@ -496,7 +629,7 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
     @application_checks.has_permissions(manage_guild=True)
     async def view_config(self, interaction: Interaction):
         await interaction.response.defer(ephemeral=True)
-        config = db.get_config(str(interaction.guild.id))
+        config = await self._get_config(str(interaction.guild.id))
 
         webhook_url = config.get("booster_announcement_webhook_url")
         webhook_status = "Set" if webhook_url else "Not Set"
@@ -525,15 +658,20 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
             return
 
         now = datetime.now(timezone.utc)
-        config = db.get_config(str(guild.id))
-        reward_roles = db.get_all_reward_roles()
+        now_year, now_month, now_day = now.year, now.month, now.day
+        config = await self._get_config(str(guild.id))
+        reward_roles = await self._run_db(db.get_all_reward_roles)
         if not reward_roles:
             await interaction.send("No reward roles configured.", ephemeral=True)
             return
 
-        active_boosters = [b for b in db.get_all_boosters_for_leaderboard() if b.get('is_currently_boosting')]
+        active_boosters = await self._run_db(db.get_active_boosters)
         sent_announcements = 0
         assigned_roles = 0
+        template = config.get("anniversary_message_template", DEFAULT_ANNIVERSARY_TEMPLATE)
+        guild_id_str = str(guild.id)
+        resolved_rewards = self._resolve_reward_roles(guild, reward_roles)
+        milestones = [milestone for milestone, _ in resolved_rewards]
 
         for booster_data in active_boosters:
             user_id = str(booster_data['user_id'])
@@ -541,52 +679,49 @@ class BoostTrackerCog(commands.Cog, name="Boost Tracker"):
             if not start_ts:
                 continue
 
-            boost_start = datetime.fromtimestamp(start_ts, tz=timezone.utc)
-            months_boosted = (now.year - boost_start.year) * 12 + (now.month - boost_start.month)
-            if now.day < boost_start.day:
-                months_boosted -= 1
+            months_boosted = months_between(start_ts, now_year, now_month, now_day)
 
             member = guild.get_member(int(user_id))
             if not member:
                 continue
+            month_label = "month" if months_boosted == 1 else "months"
+            member_role_ids = {r.id for r in member.roles}
+            last_milestone = booster_data.get('last_notified_milestone') or 0
+            notified_milestone = last_milestone
+
+            role_grants = []
+            announcements = []  # (milestone, coroutine)
+            # Rewards are sorted by milestone, and nothing below applies to an unreached one
+            for milestone, role in resolved_rewards[:bisect.bisect_right(milestones, months_boosted)]:
+                # Assign role if milestone reached and not already assigned
+                if role.id not in member_role_ids:
+                    # Mark it as held now so a role configured for several milestones is only granted once
+                    member_role_ids.add(role.id)
+                    role_grants.append(self._grant_reward_role(member, role, milestone, months_boosted))
 
-            for reward in reward_roles:
-                milestone = reward['duration_months']
-                role = guild.get_role(int(reward['role_id']))
-                if not role:
+                # Announce each milestone only once per streak
+                if milestone <= last_milestone:
                     continue
-
-                # Assign role if milestone reached and not already assigned
-                if months_boosted >= milestone and role not in member.roles:
-                    try:
-                        await member.add_roles(role, reason=f"Reached {milestone} months of boosting.")
-                        assigned_roles += 1
-                    except Exception as e:
-                        logger.error(f"Failed to assign role to {member.display_name}: {e}")
-
-                # Send anniversary message if just hit the milestone this month
-                # (You may want to track last notified milestone in your DB for production)
-                if months_boosted >= milestone:
-                    template = config.get("anniversary_message_template", "{mention} has been boosting for {months} {month_label}!")
-                    month_label = "month" if months_boosted == 1 else "months"
-                    content = template.format(
-                        mention=member.mention,
-                        user=member.name,
-                        server=guild.name,
-                        months=months_boosted,
-                        month_label=month_label
-                    )
-                    webhook_url = config.get("booster_announcement_webhook_url")
-                    if webhook_url:
-                        logger.info(f"Attempting to send anniversary message via webhook: {webhook_url}")
-                        async with aiohttp.ClientSession() as session:
-                            try:
-                                webhook = Webhook.from_url(webhook_url, session=session)
-                                await webhook.send(content)
-                                sent_announcements += 1
-                                logger.info("Anniversary message sent via webhook.")
-                            except Exception as e:
-                                logger.error(f"Failed to send anniversary webhook: {e}")
+                content = format_anniversary(template, {
+                    'mention': member.mention,
+                    'user': member.name,
+                    'server': guild.name,
+                    'months': months_boosted,
+                    'month_label': month_label,
+                })
+                announcements.append((milestone, self._announce(guild_id_str, content, "Anniversary message")))
+
+            # Overlap this member's role grants and announcements instead of awaiting each in turn
+            results = await asyncio.gather(*role_grants, *(coro for _, coro in announcements))
+            granted, announced = results[:len(role_grants)], results[len(role_grants):]
+            assigned_roles += sum(granted)
+            for (milestone, _), sent in zip(announcements, announced):
+                if sent:
+                    sent_announcements += 1
+                    notified_milestone = max(notified_milestone, milestone)
+
+            if notified_milestone > last_milestone:
+                await self._run_db(db.set_last_notified_milestone, user_id, notified_milestone)
 
 def setup(bot):
     bot.add_cog(BoostTrackerCog(bot))
\ No newline at end of file
@@ -1,196 +1,273 @@
 import nextcord
-from nextcord.ext import commands, application_checks
-from nextcord import Interaction, SlashOption, ChannelType, TextChannel, ForumChannel
+from nextcord.ext import commands
+from nextcord import Interaction, SlashOption, ChannelType, TextChannel
 from db_utils import database # <<< CORRECTED IMPORT
 import logging
 import sqlite3 
+import asyncio
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger('nextcord.config_cog')
 
 # Define constants used in this cog for display defaults if settings are not yet in DB
 DEFAULT_DELETE_DELAY_DAYS_FOR_DISPLAY = 7
 DEFAULT_SCAN_INTERVAL_MINUTES_FOR_DISPLAY = 60 
 MAX_DELETE_DELAY_DAYS = 30 # Example maximum
 MIN_DELETE_DELAY_DAYS = 0  # Allow 0 for near-immediate deletion
+SETTINGS_WRITE_COALESCE_SECONDS = 0.05 # set_* commands landing within this window share one database write
+MONITORED_CHANNEL_TYPES = (ChannelType.text, ChannelType.forum) # Channel kinds the Ticket Manager can scan threads in
+
+_NO_SUCH_COLUMN = "no such column"
+_SQLITE_ERROR = getattr(sqlite3, 'SQLITE_ERROR', 1) # Module constant only exists on Python 3.11+
+
+def _is_missing_column_error(error: sqlite3.OperationalError) -> bool:
+    # SQLite reports a missing column with the generic SQLITE_ERROR code (exposed on Python 3.11+), so the
+    # code only rules errors out; the message identifies the case. SQLite's messages are already lowercase.
+    if getattr(error, 'sqlite_errorcode', _SQLITE_ERROR) != _SQLITE_ERROR:
+        return False
+    message = error.args[0] if error.args else ""
+    return isinstance(message, str) and _NO_SUCH_COLUMN in message
 
 class ConfigCog(commands.Cog, name="Bot Configuration"):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self._announcement_cog = None
+        self._announcement_reload = None
+        self._pending_settings: Dict[str, Any] = {}
+        self._settings_flush: Optional[asyncio.Task] = None
+        self._log_channel_mentions: Dict[int, str] = {} # Log channel id -> mention, filled when set or first shown
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # Warm the settings cache so the first config command doesn't wait on SQLite; writes keep it current.
+        # (nextcord doesn't call cog_load, so this hangs off on_ready.)
+        target_guild_id = getattr(self.bot, 'target_guild_id', None)
+        if target_guild_id:
+            await asyncio.to_thread(database.get_all_config, target_guild_id)
+
+    def _queue_setting(self, key: str, value: Any) -> asyncio.Task:
+        # Returns the flush task that will persist this value; callers await it before confirming
+        self._pending_settings[key] = value
+        if self._settings_flush is None:
+            self._settings_flush = asyncio.create_task(self._flush_settings())
+        return self._settings_flush
+
+    async def _flush_settings(self):
+        try:
+            await asyncio.sleep(SETTINGS_WRITE_COALESCE_SECONDS)
+            while self._pending_settings:
+                # Detach the batch before writing; settings queued during the write are picked up by the next pass,
+                # so there is never more than one flush and awaiting it covers the write in flight
+                updates, self._pending_settings = self._pending_settings, {}
+                await asyncio.to_thread(database.update_settings, self.bot.target_guild_id, updates)
+        finally:
+            self._settings_flush = None
 
-    async def cog_check(self, interaction: Interaction) -> bool:
-        # This check applies to all commands in this cog for single-server operation
-        if not self.bot.target_guild_id: 
-            if not interaction.response.is_done():
-                try: await interaction.response.defer(ephemeral=True)
-                except nextcord.NotFound: pass # Interaction might have already expired if bot was slow
-            await interaction.followup.send("Bot is not yet ready or target server not identified. Please wait a moment and try again.", ephemeral=True)
+    def _log_channel_mention(self, guild: nextcord.Guild, channel_id: Optional[int]) -> str:
+        if not channel_id:
+            return "Not Set"
+        mention = self._log_channel_mentions.get(channel_id)
+        if mention is None:
+            channel = guild.get_channel(channel_id)
+            if channel is None:
+                return "Not Set"
+            mention = self._log_channel_mentions[channel_id] = channel.mention
+        return mention
+
+    @commands.Cog.listener()
+    async def on_guild_channel_delete(self, channel: nextcord.abc.GuildChannel):
+        # A deleted log channel must show as "Not Set" again rather than as a stale mention
+        self._log_channel_mentions.pop(channel.id, None)
+
+    def _get_announcement_reload(self):
+        # Only re-resolve _load_config when the Announcements cog has been (re)loaded since the last lookup
+        announcement_cog = self.bot.get_cog("Announcements")
+        if announcement_cog is not self._announcement_cog:
+            self._announcement_cog = announcement_cog
+            load_config = getattr(announcement_cog, '_load_config', None)
+            self._announcement_reload = load_config if callable(load_config) else None
+        return self._announcement_reload
+
+    async def _defer(self, interaction: Interaction) -> bool:
+        # Acknowledge once, unless something has already answered the interaction
+        if not interaction.response.is_done():
+            try: await interaction.response.defer(ephemeral=True)
+            except nextcord.NotFound: return False # Interaction might have already expired if bot was slow
+        return True
+
+    async def _reject(self, interaction: Interaction, message: str):
+        if not interaction.response.is_done():
+            try: await interaction.response.send_message(message, ephemeral=True)
+            except nextcord.NotFound: pass # Interaction might have already expired if bot was slow
+        else:
+            await interaction.followup.send(message, ephemeral=True)
+
+    async def cog_application_command_check(self, interaction: Interaction) -> bool:
+        # This check applies to all slash commands in this cog for single-server operation
+        # (nextcord only runs cog_check for prefix commands).
+        # The checks below are in-memory, so rejections are answered directly; the ACK comes once they pass.
+        target_guild_id = self.bot.target_guild_id
+        if not target_guild_id: 
+            await self._reject(interaction, "Bot is not yet ready or target server not identified. Please wait a moment and try again.")
             return False
-        if interaction.guild is None or interaction.guild.id != self.bot.target_guild_id:
-            if not interaction.response.is_done():
-                try: await interaction.response.defer(ephemeral=True)
-                except nextcord.NotFound: pass
+        guild = interaction.guild
+        if guild is None or guild.id != target_guild_id:
             target_guild_name = getattr(self.bot, 'target_guild_name', 'the configured server')
-            await interaction.followup.send(f"This bot is configured for a specific server. Please use commands in '{target_guild_name}'.", ephemeral=True)
+            await self._reject(interaction, f"This bot is configured for a specific server. Please use commands in '{target_guild_name}'.")
             return False
-        return True
+        # One permission bit test here instead of a has_permissions check wrapped around every subcommand
+        if not interaction.user.guild_permissions.manage_guild:
+            await self._reject(interaction, "You lack `Manage Guild` permission to use this command.")
+            return False
+        # Defer before the subcommand runs so its database work can't run past Discord's 3 second window
+        return await self._defer(interaction)
 
     @nextcord.slash_command(name="config", description="Configure general bot settings.")
     async def config_group(self, interaction: Interaction):
         pass 
 
     @config_group.subcommand(name="set_scan_interval", description="Sets how often Ticket Manager checks archived threads.")
-    @application_checks.has_permissions(manage_guild=True)
     async def set_scan_interval(self, interaction: Interaction, minutes: int = SlashOption(description="Interval in minutes", required=True)):
-        await interaction.response.defer(ephemeral=True)
         if minutes <= 0:
-            await interaction.followup.send("Scan interval must be a positive number of minutes.", ephemeral=True)
+            await self._reject(interaction, "Scan interval must be a positive number of minutes.")
             return
-        database.update_setting(self.bot.target_guild_id, 'scan_interval_minutes', minutes)
+        await self._queue_setting('scan_interval_minutes', minutes)
         await interaction.followup.send(f"Ticket Manager scan interval set to {minutes} minutes.", ephemeral=True)
-        logging.info(f"Scan interval set to {minutes} for target guild {self.bot.target_guild_id} by {interaction.user.name}")
+        logger.info("Scan interval set to %s for target guild %s by %s", minutes, self.bot.target_guild_id, interaction.user.name)
 
     @config_group.subcommand(name="set_delete_delay", description=f"Sets days after ticket closure for deletion ({MIN_DELETE_DELAY_DAYS}-{MAX_DELETE_DELAY_DAYS} days).")
-    @application_checks.has_permissions(manage_guild=True)
     async def set_delete_delay(self, interaction: Interaction, days: int = SlashOption(description=f"Delay in days (Min: {MIN_DELETE_DELAY_DAYS}, Max: {MAX_DELETE_DELAY_DAYS})", required=True)):
-        await interaction.response.defer(ephemeral=True)
         if not (MIN_DELETE_DELAY_DAYS <= days <= MAX_DELETE_DELAY_DAYS):
-            await interaction.followup.send(
-                f"Delete delay for tickets must be between {MIN_DELETE_DELAY_DAYS} and {MAX_DELETE_DELAY_DAYS} days.",
-                ephemeral=True
+            await self._reject(
+                interaction,
+                f"Delete delay for tickets must be between {MIN_DELETE_DELAY_DAYS} and {MAX_DELETE_DELAY_DAYS} days."
             )
             return
-        database.update_setting(self.bot.target_guild_id, 'delete_delay_days', days)
+        await self._queue_setting('delete_delay_days', days)
         await interaction.followup.send(f"Ticket delete delay set to {days} day(s).", ephemeral=True)
-        logging.info(f"Delete delay set to {days} for target guild {self.bot.target_guild_id} by {interaction.user.name}")
+        logger.info("Delete delay set to %s for target guild %s by %s", days, self.bot.target_guild_id, interaction.user.name)
 
     @config_group.subcommand(name="set_main_log_channel", description="Designates the main log channel (e.g., for Ticket Manager actions).")
-    @application_checks.has_permissions(manage_guild=True)
     async def set_main_log_channel(self, interaction: Interaction, channel: TextChannel = SlashOption(description="The text channel for main bot logs", required=True)):
-        await interaction.response.defer(ephemeral=True)
-        database.update_setting(self.bot.target_guild_id, 'log_channel_id', channel.id)
+        await self._queue_setting('log_channel_id', channel.id)
+        self._log_channel_mentions[channel.id] = channel.mention
         await interaction.followup.send(f"Main bot log channel set to: {channel.mention}.", ephemeral=True)
-        logging.info(f"Main log channel set to {channel.id} for target guild {self.bot.target_guild_id} by {interaction.user.name}")
+        logger.info("Main log channel set to %s for target guild %s by %s", channel.id, self.bot.target_guild_id, interaction.user.name)
 
     @config_group.subcommand(name="set_announcement_log_channel", description="Designates a specific log channel for the Announcement cog.")
-    @application_checks.has_permissions(manage_guild=True)
     async def set_announcement_log_channel(self, interaction: Interaction, channel: TextChannel = SlashOption(description="The text channel for announcement cog logs", required=True)):
-        await interaction.response.defer(ephemeral=True)
-        database.update_setting(self.bot.target_guild_id, 'announcement_log_channel_id', channel.id)
+        await self._queue_setting('announcement_log_channel_id', channel.id)
+        self._log_channel_mentions[channel.id] = channel.mention
         await interaction.followup.send(f"Announcement cog log channel set to: {channel.mention}.", ephemeral=True)
-        logging.info(f"Announcement log channel set to {channel.id} for target guild {self.bot.target_guild_id} by {interaction.user.name}")
+        logger.info("Announcement log channel set to %s for target guild %s by %s", channel.id, self.bot.target_guild_id, interaction.user.name)
         
-        announcement_cog = self.bot.get_cog("Announcements") 
-        if announcement_cog and hasattr(announcement_cog, '_load_config'):
-             if callable(getattr(announcement_cog, '_load_config', None)):
-                await announcement_cog._load_config(self.bot.target_guild_id)
+        load_config = self._get_announcement_reload()
+        if load_config is not None:
+            await load_config(self.bot.target_guild_id)
 
     @config_group.subcommand(name="add_monitored_channel", description="Adds a text/forum channel for Ticket Manager to scan threads in.")
-    @application_checks.has_permissions(manage_guild=True)
     async def add_monitored_channel(self, 
                                     interaction: Interaction, 
                                     channel_to_monitor: nextcord.abc.GuildChannel = SlashOption(
                                         description="The text or forum channel to monitor",
-                                        channel_types=[ChannelType.text, ChannelType.forum], 
+                                        channel_types=MONITORED_CHANNEL_TYPES, 
                                         required=True
                                     )):
-        await interaction.response.defer(ephemeral=True)
-        
-        if not isinstance(channel_to_monitor, (TextChannel, ForumChannel)):
-             await interaction.followup.send(f"'{channel_to_monitor.name}' is not a valid text or forum channel for monitoring threads.", ephemeral=True)
-             return
-            
-        if database.add_monitored_channel(self.bot.target_guild_id, channel_to_monitor.id):
+        # channel_types on the SlashOption is authoritative: Discord only offers and accepts text/forum channels here
+        added = await asyncio.to_thread(database.add_monitored_channel, self.bot.target_guild_id, channel_to_monitor.id)
+        if added:
             await interaction.followup.send(f"Channel {channel_to_monitor.mention} (`{channel_to_monitor.name}`) will now be monitored by the Ticket Manager.", ephemeral=True, suppress_embeds=True)
-            logging.info(f"Added monitored channel {channel_to_monitor.id} ('{channel_to_monitor.name}') type: {type(channel_to_monitor).__name__} for guild {self.bot.target_guild_id} by {interaction.user.name}")
+            logger.info("Added monitored channel %s ('%s') type: %s for guild %s by %s", channel_to_monitor.id, channel_to_monitor.name, type(channel_to_monitor).__name__, self.bot.target_guild_id, interaction.user.name)
         else:
             await interaction.followup.send(f"Channel {channel_to_monitor.mention} (`{channel_to_monitor.name}`) is already being monitored by the Ticket Manager.", ephemeral=True, suppress_embeds=True)
 
     @config_group.subcommand(name="remove_monitored_channel", description="Removes a channel from Ticket Manager's thread scanning list.")
-    @application_checks.has_permissions(manage_guild=True)
     async def remove_monitored_channel(self, interaction: Interaction, channel_id_to_remove: str = SlashOption(description="The ID of the channel to remove from monitoring", required=True)):
-        await interaction.response.defer(ephemeral=True)
+        # Check the format up front rather than raising and catching ValueError from int()
+        channel_id_str = channel_id_to_remove.strip()
+        if not channel_id_str.isdecimal():
+            await self._reject(interaction, f"'{channel_id_to_remove}' is not a valid channel ID format.")
+            return
+        chan_id = int(channel_id_str)
         try:
-            chan_id = int(channel_id_to_remove)
+            removed = await asyncio.to_thread(database.remove_monitored_channel, self.bot.target_guild_id, chan_id)
             channel_obj = self.bot.get_channel(chan_id) 
             channel_name_mention = channel_obj.mention if channel_obj else f"ID `{chan_id}`"
             channel_name_log = channel_obj.name if channel_obj else f"ID {chan_id}"
 
-            if database.remove_monitored_channel(self.bot.target_guild_id, chan_id):
+            if removed:
                 await interaction.followup.send(f"Channel {channel_name_mention} will no longer be monitored by the Ticket Manager.", ephemeral=True, suppress_embeds=True)
-                logging.info(f"Removed monitored channel {chan_id} ('{channel_name_log}') for guild {self.bot.target_guild_id} by {interaction.user.name}")
+                logger.info("Removed monitored channel %s ('%s') for guild %s by %s", chan_id, channel_name_log, self.bot.target_guild_id, interaction.user.name)
             else:
                 await interaction.followup.send(f"Channel {channel_name_mention} was not found in the Ticket Manager's monitored list.", ephemeral=True, suppress_embeds=True)
-        except ValueError:
-            await interaction.followup.send(f"'{channel_id_to_remove}' is not a valid channel ID format.", ephemeral=True)
         except Exception as e:
-            await interaction.followup.send(f"An error occurred: {e}", ephemeral=True)
-            logging.error(f"Error removing monitored channel: {e}", exc_info=True)
+            await self._reject(interaction, f"An error occurred: {e}")
+            logger.error("Error removing monitored channel: %s", e, exc_info=True)
 
     @config_group.subcommand(name="view_settings", description="Displays current general bot configurations.")
-    @application_checks.has_permissions(manage_guild=True)
     async def view_settings(self, interaction: Interaction):
-        await interaction.response.defer(ephemeral=True) 
-        
         target_gid = self.bot.target_guild_id
         
-        settings = database.get_guild_settings(target_gid)
-        monitored_channel_ids = database.get_monitored_channels(target_gid)
-        embed = nextcord.Embed(title=f"General Bot Configuration for {interaction.guild.name}", color=nextcord.Color.blue())
+        if self._settings_flush is not None:
+            await self._settings_flush # Covers both queued and in-flight writes, so recent changes are shown
+        settings, monitored_channel_ids = await asyncio.to_thread(database.get_all_config, target_gid)
 
         if not settings and not monitored_channel_ids:
-             embed.description = "No general settings configured yet. Using defaults where applicable.\nTicket Manager will scan all accessible text and forum channels."
-             await interaction.followup.send(embed=embed, ephemeral=True)
+             await interaction.followup.send("No general settings configured yet. Using defaults where applicable.\nTicket Manager will scan all accessible text and forum channels.", ephemeral=True)
              return
         
         settings = settings if settings is not None else {} 
+        settings_get = settings.get
+        # guild.get_channel is already a dict lookup; bind it once rather than re-resolving interaction.guild per channel
+        get_channel = interaction.guild.get_channel
 
-        embed.add_field(name="Scan Interval (Ticket Manager)", value=f"{settings.get('scan_interval_minutes', DEFAULT_SCAN_INTERVAL_MINUTES_FOR_DISPLAY)} minutes", inline=False)
-        embed.add_field(name="Delete Delay (Ticket Manager)", value=f"{settings.get('delete_delay_days', DEFAULT_DELETE_DELAY_DAYS_FOR_DISPLAY)} day(s)", inline=False)
-        
-        main_log_channel_obj = interaction.guild.get_channel(settings.get('log_channel_id')) if settings.get('log_channel_id') else None
-        embed.add_field(name="Main Log Channel (e.g., Ticket Manager)", value=main_log_channel_obj.mention if main_log_channel_obj else "Not Set", inline=False)
-        
-        announcement_log_obj = interaction.guild.get_channel(settings.get('announcement_log_channel_id')) if settings.get('announcement_log_channel_id') else None
-        embed.add_field(name="Announcement Log Channel", value=announcement_log_obj.mention if announcement_log_obj else "Not Set", inline=False)
-        
         if monitored_channel_ids:
-            channel_mentions = []
-            for chan_id in monitored_channel_ids:
-                chan_obj = interaction.guild.get_channel(chan_id) 
-                channel_mentions.append(f"{chan_obj.mention} (`{chan_obj.name}`)" if chan_obj else f"Unknown Channel (ID: {chan_id})")
-            embed.add_field(name="Monitored Channels (Ticket Manager)", value="\n".join(channel_mentions) if channel_mentions else "None Set", inline=False)
+            # Resolve every id in one map() pass over the bound lookup
+            monitored_value = "\n".join([
+                f"{chan_obj.mention} (`{chan_obj.name}`)" if chan_obj else f"Unknown Channel (ID: {chan_id})"
+                for chan_id, chan_obj in zip(monitored_channel_ids, map(get_channel, monitored_channel_ids))
+            ])
         else:
-            embed.add_field(name="Monitored Channels (Ticket Manager)", value="None (Scanning all text and forum channels)", inline=False)
+            monitored_value = "None (Scanning all text and forum channels)"
+
+        # Build every field up front and construct the embed in one go instead of five add_field calls
+        embed = nextcord.Embed.from_dict({
+            "title": f"General Bot Configuration for {interaction.guild.name}",
+            "color": nextcord.Color.blue().value,
+            "fields": [
+                {"name": "Scan Interval (Ticket Manager)", "value": f"{settings_get('scan_interval_minutes', DEFAULT_SCAN_INTERVAL_MINUTES_FOR_DISPLAY)} minutes", "inline": False},
+                {"name": "Delete Delay (Ticket Manager)", "value": f"{settings_get('delete_delay_days', DEFAULT_DELETE_DELAY_DAYS_FOR_DISPLAY)} day(s)", "inline": False},
+                {"name": "Main Log Channel (e.g., Ticket Manager)", "value": self._log_channel_mention(interaction.guild, settings_get('log_channel_id')), "inline": False},
+                {"name": "Announcement Log Channel", "value": self._log_channel_mention(interaction.guild, settings_get('announcement_log_channel_id')), "inline": False},
+                {"name": "Monitored Channels (Ticket Manager)", "value": monitored_value, "inline": False},
+            ],
+        })
         
         await interaction.followup.send(embed=embed, ephemeral=True)
 
-    # Error Handler - Decorators on separate lines, correct signature
-    @set_scan_interval.error
-    @set_delete_delay.error
-    @set_main_log_channel.error 
-    @set_announcement_log_channel.error
-    @add_monitored_channel.error 
-    @remove_monitored_channel.error 
-    @view_settings.error
+    # Error Handler - registered once on the /config group; nextcord hands it down to every subcommand
+    # that doesn't set its own when the cog is loaded
+    @config_group.error
     async def config_command_error(self, interaction: Interaction, error): 
+        if isinstance(error, nextcord.ApplicationCheckFailure):
+            return # cog_application_command_check has already told the user why
         send_method = interaction.followup.send
         if not interaction.response.is_done():
             try: 
                 await interaction.response.defer(ephemeral=True)
             except nextcord.NotFound: 
-                logging.warning(f"Interaction expired before error handler could defer for user {interaction.user.id}. Error: {error}")
+                logger.warning("Interaction expired before error handler could defer for user %s. Error: %s", interaction.user.id, error)
                 return 
         
-        if isinstance(error, application_checks.ApplicationMissingPermissions): 
-            await send_method("You lack `Manage Guild` permission to use this command.", ephemeral=True)
+        original_error = getattr(error, 'original', error) 
+        if isinstance(original_error, sqlite3.OperationalError) and _is_missing_column_error(original_error):
+            await send_method("Database schema error. The bot admin may need to delete the `.db` file and reconfigure settings after restarting the bot.", ephemeral=True)
+            logger.error("Database schema error: %s", original_error, exc_info=True)
+        elif isinstance(error, nextcord.errors.NotFound) and error.code == 10062: 
+             logger.warning("Caught 'Unknown Interaction' in config_command_error for user %s. Original error: %s", interaction.user.id, error)
         else:
-            original_error = getattr(error, 'original', error) 
-            if isinstance(original_error, sqlite3.OperationalError) and "no such column" in str(original_error).lower():
-                await send_method("Database schema error. The bot admin may need to delete the `.db` file and reconfigure settings after restarting the bot.", ephemeral=True)
-                logging.error(f"Database schema error: {original_error}", exc_info=True)
-            elif isinstance(error, nextcord.errors.NotFound) and error.code == 10062: 
-                 logging.warning(f"Caught 'Unknown Interaction' in config_command_error for user {interaction.user.id}. Original error: {error}")
-            else:
-                await send_method(f"An unexpected error occurred in a config command: {type(error).__name__}", ephemeral=True)
-                logging.error(f"Error in config command for user {interaction.user.id}: {error}", exc_info=True)
+            await send_method(f"An unexpected error occurred in a config command: {type(error).__name__}", ephemeral=True)
+            logger.error("Error in config command for user %s: %s", interaction.user.id, error, exc_info=True)
 
 def setup(bot: commands.Bot):
     bot.add_cog(ConfigCog(bot))
\ No newline at end of file
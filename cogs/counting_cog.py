@@ -1,21 +1,93 @@
 import nextcord
 from nextcord.ext import commands
 import logging
-import re
+import functools
+import asyncio
 from db_utils.counting_database import (
-    get_counting_channel,
+    load_all_counting_config,
     set_counting_channel,
     add_exempted_role,
     remove_exempted_role,
     get_exempted_roles,
 )
 
+logger = logging.getLogger('nextcord.counting_cog')
+
+DELETE_BATCH_DELAY_SECONDS = 0.75  # Offending messages arriving within this window are removed in one request
+BULK_DELETE_LIMIT = 100  # Discord's per-request cap for bulk deletes
+
+
+def _require_manage_guild(func):
+    """Reject the interaction unless the invoking member has Manage Server."""
+    @functools.wraps(func)
+    async def wrapper(self, interaction: nextcord.Interaction, *args, **kwargs):
+        if not interaction.user.guild_permissions.manage_guild:
+            await interaction.response.send_message("❌ You need 'Manage Server' permission to use this command.", ephemeral=True)
+            return
+        return await func(self, interaction, *args, **kwargs)
+    return wrapper
+
 
 class CountingCog(commands.Cog):
     """Cog for managing a counting channel."""
 
     def __init__(self, bot):
         self.bot = bot
+        # Load every configured guild's channel and exempted roles in one query. /counting set_channel keeps the
+        # channel cache current, so a guild missing from it has no counting channel and never touches the database.
+        config = load_all_counting_config()
+        self._channel_cache = {guild_id: channel_id for guild_id, (channel_id, _) in config.items()}  # guild_id -> counting channel id
+        # guild_id -> frozenset of exempted role ids; dropped on exemption changes and reloaded by _exempt
+        self._exempt_cache = {guild_id: exempt for guild_id, (_, exempt) in config.items()}
+        self._pending_deletes = {}  # channel_id -> messages waiting for the next bulk delete
+        self._flush_tasks = set()  # Running delete tasks; the event loop only keeps weak references to them
+
+    def cog_unload(self):
+        for task in self._flush_tasks:
+            task.cancel()
+        # Delete anything still waiting for its batch window now rather than dropping it with the cog
+        pending, self._pending_deletes = self._pending_deletes, {}
+        for messages in pending.values():
+            self._track(self._delete_messages(messages[0].channel, messages))
+
+    def _exempt(self, guild_id: int) -> frozenset:
+        """Get the exempted role ids for a guild, hitting the database only on the first lookup."""
+        try:
+            return self._exempt_cache[guild_id]
+        except KeyError:
+            exempt = self._exempt_cache[guild_id] = frozenset(get_exempted_roles(guild_id))
+            return exempt
+
+    def _track(self, coro):
+        """Run a coroutine as a task the cog holds on to until it finishes."""
+        task = asyncio.create_task(coro)
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    def _queue_delete(self, message: nextcord.Message):
+        """Queue a message for deletion; the first one queued for a channel schedules the flush."""
+        pending = self._pending_deletes.get(message.channel.id)
+        if pending is None:
+            self._pending_deletes[message.channel.id] = [message]
+            self._track(self._flush_deletes(message.channel))
+        else:
+            pending.append(message)
+
+    async def _flush_deletes(self, channel: nextcord.TextChannel):
+        """Delete everything queued for a channel once the batch window has passed."""
+        await asyncio.sleep(DELETE_BATCH_DELAY_SECONDS)
+        # Detach the batch first so messages arriving during the requests start a new one
+        await self._delete_messages(channel, self._pending_deletes.pop(channel.id, []))
+
+    async def _delete_messages(self, channel: nextcord.TextChannel, messages: list):
+        """Delete messages from a channel, up to 100 per request."""
+        # Queued messages are at most a few seconds old, well inside bulk delete's 14 day limit
+        for start in range(0, len(messages), BULK_DELETE_LIMIT):
+            batch = messages[start:start + BULK_DELETE_LIMIT]
+            try:
+                await channel.delete_messages(batch)  # A single message goes through the normal delete endpoint
+            except nextcord.HTTPException as e:
+                logger.warning("Failed to delete %s message(s) in channel %s: %s", len(batch), channel.id, e)
 
     @nextcord.slash_command(
         name="counting",
@@ -29,23 +101,17 @@ class CountingCog(commands.Cog):
         name="set_channel",
         description="Set the counting channel"
     )
+    @_require_manage_guild
     async def set_counting_channel(
         self,
         interaction: nextcord.Interaction,
-        channel: nextcord.abc.GuildChannel
+        channel: nextcord.TextChannel
     ):
         """Set which channel is used for counting."""
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("❌ You need 'Manage Server' permission to use this command.", ephemeral=True)
-            return
-
-        if not isinstance(channel, nextcord.TextChannel):
-            await interaction.response.send_message("❌ The channel must be a text channel.", ephemeral=True)
-            return
-
         success = set_counting_channel(interaction.guild_id, channel.id)
 
         if success:
+            self._channel_cache[interaction.guild_id] = channel.id
             await interaction.response.send_message(f"✅ Counting channel set to {channel.mention}")
         else:
             await interaction.response.send_message("❌ Failed to set counting channel.", ephemeral=True)
@@ -54,19 +120,17 @@ class CountingCog(commands.Cog):
         name="add_exempted_role",
         description="Add a role that is exempt from counting channel rules"
     )
+    @_require_manage_guild
     async def add_exempted_role_cmd(
         self,
         interaction: nextcord.Interaction,
         role: nextcord.Role
     ):
         """Add a role that will be exempt from message deletion."""
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("❌ You need 'Manage Server' permission to use this command.", ephemeral=True)
-            return
-
         success = add_exempted_role(interaction.guild_id, role.id)
 
         if success:
+            self._exempt_cache.pop(interaction.guild_id, None)
             await interaction.response.send_message(f"✅ Role {role.mention} is now exempt from counting rules")
         else:
             await interaction.response.send_message(f"⚠️ Role {role.mention} was already exempt.", ephemeral=True)
@@ -75,58 +139,39 @@ class CountingCog(commands.Cog):
         name="remove_exempted_role",
         description="Remove a role from the exemption list"
     )
+    @_require_manage_guild
     async def remove_exempted_role_cmd(
         self,
         interaction: nextcord.Interaction,
         role: nextcord.Role
     ):
         """Remove a role from the exemption list."""
-        if not interaction.user.guild_permissions.manage_guild:
-            await interaction.response.send_message("❌ You need 'Manage Server' permission to use this command.", ephemeral=True)
-            return
-
         success = remove_exempted_role(interaction.guild_id, role.id)
 
         if success:
+            self._exempt_cache.pop(interaction.guild_id, None)
             await interaction.response.send_message(f"✅ Role {role.mention} is no longer exempt")
         else:
             await interaction.response.send_message(f"❌ Role {role.mention} was not in the exemption list.", ephemeral=True)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: nextcord.Message):
-        """Delete messages with non-numerical characters in the counting channel."""
-        # Ignore bot messages
-        if message.author.bot:
-            return
-
-        # Ignore messages without a guild
-        if not message.guild:
-            return
-
-        # Get the counting channel for this guild
-        counting_channel_id = get_counting_channel(message.guild.id)
-
-        # If no counting channel is set, do nothing
-        if not counting_channel_id:
-            return
-
-        # If this message is not in the counting channel, do nothing
-        if message.channel.id != counting_channel_id:
+    async def handle_message(self, message: nextcord.Message):
+        """Delete messages with non-numerical characters in the counting channel. Dispatched by MessageRouterCog for non-bot guild messages."""
+        # If this guild has no counting channel, or this message is not in it, do nothing
+        guild_id = message.guild.id
+        counting_channel_id = self._channel_cache.get(guild_id)
+        if counting_channel_id is None or message.channel.id != counting_channel_id:
             return
 
         # Check if the user has an exempted role
-        exempted_roles = get_exempted_roles(message.guild.id)
-        user_role_ids = [role.id for role in message.author.roles]
-
-        if any(role_id in exempted_roles for role_id in user_role_ids):
+        exempt = self._exempt(guild_id)
+        # Member._roles is the member's raw role-id array; .roles would build (and sort) Role objects just to read their ids
+        if exempt and not exempt.isdisjoint(message.author._roles):
             return
 
-        # Check if the message contains only numerical characters (ignore whitespace)
-        if not re.match(r'^\d+$', message.content.strip()):
-            try:
-                await message.delete()
-            except nextcord.HTTPException as e:
-                logging.warning(f"Failed to delete message {message.id}: {e}")
+        # Check if the message contains only numerical characters (ignore whitespace).
+        # str.isdecimal() accepts the same characters as a \d+ regex (Unicode decimal digits) and is False for ''
+        if not message.content.strip().isdecimal():
+            self._queue_delete(message)
 
 
 def setup(bot):
@@ -0,0 +1,34 @@
+import asyncio
+import nextcord
+from nextcord.ext import commands
+import logging
+
+# Cogs whose per-message work is dispatched from here instead of their own on_message listener.
+# Each must expose an async `handle_message(message)` coroutine.
+ROUTED_COG_NAMES = ("CountingCog", "AutoReactionCog", "Auto Responder")
+
+
+class MessageRouterCog(commands.Cog, name="Message Router"):
+    """Single on_message listener that fans guild messages out to the counting, auto-reaction and auto-responder cogs."""
+
+    def __init__(self, bot: commands.Bot):
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_message(self, message: nextcord.Message):
+        # Shared early exits, done once instead of once per routed cog
+        if message.author.bot or not message.guild:
+            return
+
+        get_cog = self.bot.get_cog
+        routed = [(cog_name, cog) for cog_name in ROUTED_COG_NAMES if (cog := get_cog(cog_name)) is not None]
+        # Run the handlers concurrently, as separate listeners would, so one cog's rate-limited REST calls
+        # (e.g. a string of reactions) don't hold up another cog's response
+        results = await asyncio.gather(*(cog.handle_message(message) for _, cog in routed), return_exceptions=True)
+        for (cog_name, _), result in zip(routed, results):
+            if isinstance(result, Exception):
+                logging.error("MessageRouterCog: Error in %s message handler: %s", cog_name, result, exc_info=result)
+
+
+def setup(bot: commands.Bot):
+    bot.add_cog(MessageRouterCog(bot))
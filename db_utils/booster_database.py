@@ -1,7 +1,7 @@
 import sqlite3
 import os
 import logging
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 
 # --- Database Path Logic ---
 DEV_DATA_DIRECTORY = "/home/mattw/Projects/discord_ticket_manager/data/"
@@ -22,12 +22,16 @@ def get_db_connection() -> sqlite3.Connection:
     """Establishes and returns a SQLite database connection for the booster tracker."""
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
+    # WAL (set once in initialize_database) only needs an fsync at checkpoints with synchronous=NORMAL
+    conn.execute("PRAGMA synchronous=NORMAL")
     return conn
 
 def initialize_database():
     """Initializes the database and creates/upgrades tables."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
+        # journal_mode is persistent in the database file, so this only needs to run once
+        cursor.execute("PRAGMA journal_mode=WAL")
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS boosters (
                 user_id TEXT PRIMARY KEY,
@@ -75,6 +79,11 @@ def initialize_database():
         except Exception as e:
             if "duplicate column name" not in str(e):
                 raise
+        try:
+            cursor.execute("ALTER TABLE boosters ADD COLUMN last_notified_milestone INTEGER DEFAULT 0")
+        except sqlite3.OperationalError as e:
+            if "duplicate column name" not in str(e):
+                raise
         conn.commit()
         logging.info("Booster tracker database initialized/verified.")
         try:
@@ -90,49 +99,73 @@ def get_booster(user_id: str) -> Optional[Dict[str, Any]]:
 
 def start_new_boost(user_id: str, guild_id: str, start_timestamp: int):
     """Logs the start of a new boost streak without incrementing the count."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("INSERT OR IGNORE INTO boosters (user_id, guild_id) VALUES (?, ?)", (user_id, guild_id))
-
-        # --- MODIFIED: Removed 'total_boost_count' increment to prevent double-counting ---
-        # The on_message listener in the cog now handles the increment.
-        cursor.execute("""
-            UPDATE boosters
-            SET is_currently_boosting = 1,
-                current_boost_start_timestamp = ?,
-                last_anniversary_notified = 0
-            WHERE user_id = ?
-        """, (start_timestamp, user_id))
+    start_new_boosts([(user_id, guild_id, start_timestamp)])
 
-        # Set the first_boost_timestamp only if it's not already set
-        cursor.execute("""
-            UPDATE boosters
-            SET first_boost_timestamp = ?
-            WHERE user_id = ? AND first_boost_timestamp IS NULL
-        """, (start_timestamp, user_id))
-
-        cursor.execute("INSERT INTO boost_history (user_id, guild_id, boost_start_timestamp) VALUES (?, ?, ?)", (user_id, guild_id, start_timestamp))
-        conn.commit()
+def _start_boosts(cursor: sqlite3.Cursor, boosts: List[Tuple[str, str, int]]):
+    cursor.executemany("INSERT OR IGNORE INTO boosters (user_id, guild_id) VALUES (?, ?)", [(user_id, guild_id) for user_id, guild_id, _ in boosts])
+    cursor.executemany("""
+        UPDATE boosters
+        SET is_currently_boosting = 1,
+            current_boost_start_timestamp = ?,
+            last_anniversary_notified = 0,
+            last_notified_milestone = 0
+        WHERE user_id = ?
+    """, [(start_timestamp, user_id) for user_id, _, start_timestamp in boosts])
+    cursor.executemany("""
+        UPDATE boosters
+        SET first_boost_timestamp = ?
+        WHERE user_id = ? AND first_boost_timestamp IS NULL
+    """, [(start_timestamp, user_id) for user_id, _, start_timestamp in boosts])
+    cursor.executemany("INSERT INTO boost_history (user_id, guild_id, boost_start_timestamp) VALUES (?, ?, ?)", boosts)
 
-def end_boost(user_id: str, end_timestamp: int):
-    """Logs the end of a boost and calculates cumulative duration."""
-    with get_db_connection() as conn:
-        history_cursor = conn.cursor()
-        history_cursor.execute("SELECT event_id, boost_start_timestamp FROM boost_history WHERE user_id = ? AND boost_end_timestamp IS NULL ORDER BY boost_start_timestamp DESC LIMIT 1", (user_id,))
-        active_boost = history_cursor.fetchone()
+def _end_boosts(cursor: sqlite3.Cursor, ends: List[Tuple[str, int]]):
+    for user_id, end_timestamp in ends:
+        cursor.execute("SELECT event_id, boost_start_timestamp FROM boost_history WHERE user_id = ? AND boost_end_timestamp IS NULL ORDER BY boost_start_timestamp DESC LIMIT 1", (user_id,))
+        active_boost = cursor.fetchone()
         duration_days = 0
         if active_boost:
             duration_seconds = end_timestamp - active_boost['boost_start_timestamp']
             duration_days = duration_seconds // (24 * 3600)
-            conn.cursor().execute("UPDATE boost_history SET boost_end_timestamp = ? WHERE event_id = ?", (end_timestamp, active_boost['event_id']))
+            cursor.execute("UPDATE boost_history SET boost_end_timestamp = ? WHERE event_id = ?", (end_timestamp, active_boost['event_id']))
         
-        conn.cursor().execute("""
+        cursor.execute("""
             UPDATE boosters
             SET is_currently_boosting = 0,
                 current_boost_start_timestamp = NULL,
                 total_duration_days = total_duration_days + ?
             WHERE user_id = ?
         """, (duration_days, user_id))
+
+def start_new_boosts(boosts: List[Tuple[str, str, int]]):
+    """Logs the start of several boost streaks in one transaction. Each item is (user_id, guild_id, start_timestamp)."""
+    if not boosts:
+        return
+    with get_db_connection() as conn:
+        _start_boosts(conn.cursor(), boosts)
+        conn.commit()
+
+def end_boost(user_id: str, end_timestamp: int):
+    """Logs the end of a boost and calculates cumulative duration."""
+    end_boosts([user_id], end_timestamp)
+
+def end_boosts(user_ids: List[str], end_timestamp: int):
+    """Logs the end of several boosts in one transaction, adding each streak to the user's cumulative duration."""
+    if not user_ids:
+        return
+    with get_db_connection() as conn:
+        _end_boosts(conn.cursor(), [(user_id, end_timestamp) for user_id in user_ids])
+        conn.commit()
+
+def bulk_sync_boosters(to_end: List[Tuple[str, int]], to_start: List[Tuple[str, str, int]]):
+    """Applies a booster sync in a single transaction. to_end items are (user_id, end_timestamp),
+    to_start items are (user_id, guild_id, start_timestamp)."""
+    if not to_end and not to_start:
+        return
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        _end_boosts(cursor, to_end)
+        _start_boosts(cursor, to_start)
         conn.commit()
 
 def increment_boost_count(user_id: str, amount: int = 1):
@@ -143,16 +176,67 @@ def increment_boost_count(user_id: str, amount: int = 1):
         conn.cursor().execute("UPDATE boosters SET total_boost_count = total_boost_count + ? WHERE user_id = ?", (amount, user_id))
         conn.commit()
         
+def bump_boost_and_keys(user_id: str, boost_delta: int, key_delta: int):
+    """Adds to a user's total boost count and claimed keys in a single UPDATE."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT OR IGNORE INTO boosters (user_id, guild_id) VALUES (?, 'default')", (user_id,))
+        cursor.execute("""
+            UPDATE boosters
+            SET total_boost_count = total_boost_count + ?,
+                claimed_keys = COALESCE(claimed_keys, 0) + ?
+            WHERE user_id = ?
+        """, (boost_delta, key_delta, user_id))
+        conn.commit()
+
 def get_booster_history(user_id: str) -> List[Dict[str, Any]]:
     """Retrieves the full boost history for a user."""
     with get_db_connection() as conn:
         rows = conn.cursor().execute("SELECT * FROM boost_history WHERE user_id = ? ORDER BY boost_start_timestamp DESC", (user_id,)).fetchall()
         return [dict(row) for row in rows]
 
-def get_all_boosters_for_leaderboard() -> List[Dict[str, Any]]:
-    """Retrieves all booster data for leaderboard generation."""
+def leaderboard_by_count(limit: int = 20) -> List[Dict[str, Any]]:
+    """Retrieves the boosters with the highest total boost count."""
     with get_db_connection() as conn:
-        rows = conn.cursor().execute("SELECT * FROM boosters").fetchall()
+        rows = conn.cursor().execute("SELECT * FROM boosters ORDER BY total_boost_count DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+def leaderboard_by_streak(limit: int = 20) -> List[Dict[str, Any]]:
+    """Retrieves the active boosters with the longest current streak."""
+    with get_db_connection() as conn:
+        rows = conn.cursor().execute("""
+            SELECT * FROM boosters
+            WHERE is_currently_boosting = 1
+            ORDER BY COALESCE(current_boost_start_timestamp, 0) ASC
+            LIMIT ?
+        """, (limit,)).fetchall()
+        return [dict(row) for row in rows]
+
+def leaderboard_by_duration(now_ts: int, limit: int = 20) -> List[Dict[str, Any]]:
+    """Retrieves the boosters with the longest total duration, including the current streak, as of now_ts.
+    Each row carries the computed value in 'total_days'."""
+    with get_db_connection() as conn:
+        rows = conn.cursor().execute("""
+            SELECT *,
+                COALESCE(total_duration_days, 0) + CASE
+                    WHEN is_currently_boosting = 1 AND current_boost_start_timestamp
+                    THEN (? - current_boost_start_timestamp) / 86400
+                    ELSE 0
+                END AS total_days
+            FROM boosters
+            ORDER BY total_days DESC
+            LIMIT ?
+        """, (now_ts, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+def get_active_boosters() -> List[Dict[str, Any]]:
+    """Retrieves the columns the booster tasks need for everyone currently boosting."""
+    with get_db_connection() as conn:
+        rows = conn.cursor().execute("""
+            SELECT user_id, current_boost_start_timestamp, total_boost_count, last_anniversary_notified, last_notified_milestone
+            FROM boosters
+            WHERE is_currently_boosting = 1
+        """).fetchall()
         return [dict(row) for row in rows]
 
 def get_config(guild_id: str) -> Optional[Dict[str, Any]]:
@@ -195,6 +279,27 @@ def update_anniversary_notified(user_id: str, month_milestone: int):
         conn.cursor().execute("UPDATE boosters SET last_anniversary_notified = ? WHERE user_id = ?", (month_milestone, user_id))
         conn.commit()
 
+def set_last_notified_milestone(user_id: str, milestone: int):
+    """Records the highest reward milestone a booster has been announced for in their current streak."""
+    with get_db_connection() as conn:
+        conn.cursor().execute("UPDATE boosters SET last_notified_milestone = ? WHERE user_id = ?", (milestone, user_id))
+        conn.commit()
+
+def record_anniversaries(updates: List[Tuple[str, int, int]]):
+    """Applies several monthly anniversaries in one transaction. Each item is (user_id, keys_to_add, month_milestone):
+    the boost count is incremented by 1, the keys are added and the milestone is stored as last notified."""
+    if not updates:
+        return
+    with get_db_connection() as conn:
+        conn.cursor().executemany("""
+            UPDATE boosters
+            SET total_boost_count = total_boost_count + 1,
+                claimed_keys = COALESCE(claimed_keys, 0) + ?,
+                last_anniversary_notified = ?
+            WHERE user_id = ?
+        """, [(keys, month_milestone, user_id) for user_id, keys, month_milestone in updates])
+        conn.commit()
+
 def add_claimed_keys(user_id: str, amount: int):
     with get_db_connection() as conn:
         cursor = conn.cursor()
@@ -40,6 +40,29 @@ def get_counting_channel(guild_id: int) -> Optional[int]:
     finally:
         conn.close()
 
+def load_all_counting_config() -> dict:
+    """Get {guild_id: (counting_channel_id, frozenset(exempted_role_ids))} for every guild with a counting channel."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    channels = {}
+    roles = {}
+    try:
+        cursor.execute(
+            "SELECT s.guild_id, s.counting_channel_id, r.role_id FROM settings s "
+            "LEFT JOIN counting_exempted_roles r ON r.guild_id = s.guild_id "
+            "WHERE s.counting_channel_id IS NOT NULL"
+        )
+        for row in cursor.fetchall():
+            channels[row['guild_id']] = row['counting_channel_id']
+            guild_roles = roles.setdefault(row['guild_id'], [])
+            if row['role_id'] is not None:
+                guild_roles.append(row['role_id'])
+    except sqlite3.Error as e:
+        logging.error(f"DB Error loading counting config: {e}")
+    finally:
+        conn.close()
+    return {guild_id: (channel_id, frozenset(roles[guild_id])) for guild_id, channel_id in channels.items()}
+
 def set_counting_channel(guild_id: int, channel_id: int) -> bool:
     """Set the counting channel ID for a guild."""
     conn = get_db_connection()
@@ -4,6 +4,7 @@ from typing import Optional, List, Tuple, Dict, Any, Set
 from datetime import datetime, timezone 
 import os 
 import json
+import time
 
 DEV_DATA_DIRECTORY = "/home/mattw/Projects/discord_ticket_manager/data/" # Your local development data directory
 PROD_DATA_DIRECTORY = "/home/container/data/"    # Container data directory
@@ -41,11 +42,17 @@ if 'INVITES_DATABASE_NAME' in locals(): # Check if defined
 def get_db_connection(): # Connects to the main database
     conn = sqlite3.connect(DATABASE_MAIN_NAME)
     conn.row_factory = sqlite3.Row 
+    # WAL (set once in initialize_database) only needs an fsync at checkpoints with synchronous=NORMAL
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")
     return conn
 
 def initialize_database(): # Initializes tables in the main database
     conn = get_db_connection()
     cursor = conn.cursor()
+    # journal_mode is persistent in the database file, so this only needs to run once
+    cursor.execute("PRAGMA journal_mode=WAL")
 
     # 1. General bot settings
     cursor.execute('''
@@ -153,25 +160,84 @@ def initialize_database(): # Initializes tables in the main database
     conn.close()
     logging.info(f"Main Database '{DATABASE_MAIN_NAME}' initialized (all tables checked/created).")
 
+# --- Read cache for guild settings and monitored channels ---
+# Entries are keyed by (guild_id, kind) and kept current by the write functions below, so the TTL only
+# bounds staleness from writers outside this module (e.g. counting_database.set_counting_channel).
+SETTINGS_CACHE_TTL_SECONDS = 60
+_settings_cache: Dict[Tuple[int, str], Tuple[float, Any]] = {}
+
+def _cache_get(guild_id: int, kind: str) -> Tuple[bool, Any]:
+    entry = _settings_cache.get((guild_id, kind))
+    if entry and time.monotonic() < entry[0]:
+        return True, entry[1]
+    return False, None
+
+def _cache_put(guild_id: int, kind: str, value: Any):
+    _settings_cache[(guild_id, kind)] = (time.monotonic() + SETTINGS_CACHE_TTL_SECONDS, value)
+
+def _cache_replace(guild_id: int, kind: str, update):
+    # Write-through for cached entries: apply update to a live entry, or drop it so the next read goes to the database
+    hit, cached = _cache_get(guild_id, kind)
+    if hit and cached is not None:
+        _cache_put(guild_id, kind, update(cached))
+    else:
+        _settings_cache.pop((guild_id, kind), None)
+
 # --- General Settings Functions (for settings table) ---
 def get_guild_settings(guild_id: int) -> Optional[Dict[str, Any]]:
+    hit, cached = _cache_get(guild_id, 'settings')
+    if hit:
+        return dict(cached) if cached else None
     conn = get_db_connection(); cursor = conn.cursor()
     try:
         cursor.execute("SELECT * FROM settings WHERE guild_id = ?", (guild_id,))
         row = cursor.fetchone()
-        return dict(row) if row else None
-    except sqlite3.Error as e: logging.error(f"DB Error getting guild_settings for {guild_id}: {e}"); return None
+        settings = dict(row) if row else None
+        _cache_put(guild_id, 'settings', settings)
+        return dict(settings) if settings else None
+    except sqlite3.Error as e: logging.error("DB Error getting guild_settings for %s: %s", guild_id, e); return None
     finally: 
         if conn: conn.close()
 
+# One constant upsert per settings column; only whitelisted column names are ever formatted into SQL
+_SETTINGS_UPSERT_SQL = {
+    column: f"INSERT INTO settings (guild_id, {column}) VALUES (?, ?) ON CONFLICT(guild_id) DO UPDATE SET {column} = excluded.{column}"
+    for column in ('scan_interval_minutes', 'delete_delay_days', 'log_channel_id', 'announcement_log_channel_id', 'counting_channel_id')
+}
+
 def update_setting(guild_id: int, key: str, value: Any): 
+    sql = _SETTINGS_UPSERT_SQL.get(key)
+    if sql is None:
+        logging.error("Refusing to update unknown general setting '%s' for guild_id %s", key, guild_id)
+        return
     conn = get_db_connection(); cursor = conn.cursor()
     try:
-        cursor.execute("INSERT OR IGNORE INTO settings (guild_id) VALUES (?)", (guild_id,))
-        cursor.execute(f"UPDATE settings SET {key} = ? WHERE guild_id = ?", (value, guild_id))
+        cursor.execute(sql, (guild_id, value))
         conn.commit()
-        logging.info(f"Updated general setting '{key}' to '{value}' for guild_id {guild_id}")
-    except sqlite3.Error as e: logging.error(f"DB Error updating setting '{key}' for {guild_id}: {e}")
+        _cache_replace(guild_id, 'settings', lambda cached: {**cached, key: value})
+        logging.info("Updated general setting '%s' to '%s' for guild_id %s", key, value, guild_id)
+    except sqlite3.Error as e: logging.error("DB Error updating setting '%s' for %s: %s", key, guild_id, e)
+    finally: 
+        if conn: conn.close()
+
+def update_settings(guild_id: int, updates: Dict[str, Any]):
+    """Writes several general settings for a guild in one upsert (and one commit)."""
+    unknown = [key for key in updates if key not in _SETTINGS_UPSERT_SQL]
+    if unknown:
+        logging.error("Refusing to update unknown general settings %s for guild_id %s", unknown, guild_id)
+        return
+    if not updates:
+        return
+    columns = list(updates)
+    sql = (f"INSERT INTO settings (guild_id, {', '.join(columns)}) VALUES (?{', ?' * len(columns)}) "
+           f"ON CONFLICT(guild_id) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in columns)}")
+    conn = get_db_connection(); cursor = conn.cursor()
+    try:
+        cursor.execute(sql, (guild_id, *updates.values()))
+        conn.commit()
+        _cache_replace(guild_id, 'settings', lambda cached: {**cached, **updates})
+        logging.info("Updated general settings %s for guild_id %s", updates, guild_id)
+    except sqlite3.Error as e: logging.error("DB Error updating settings %s for %s: %s", columns, guild_id, e)
     finally: 
         if conn: conn.close()
 
@@ -181,40 +247,76 @@ def get_all_guild_configs() -> List[Dict[str, Any]]:
     try:
         cursor.execute("SELECT * FROM settings")
         configs = [dict(row) for row in cursor.fetchall()]
-    except sqlite3.Error as e: logging.error(f"DB Error getting all guild_configs: {e}")
+    except sqlite3.Error as e: logging.error("DB Error getting all guild_configs: %s", e)
     finally: 
         if conn: conn.close()
     return configs
 
 # --- Monitored Channels Functions ---
+def _cached_monitored(guild_id: int) -> Optional[Dict[int, None]]:
+    # Monitored channel ids are cached as an insertion-ordered dict: listing order is kept and membership is O(1)
+    hit, cached = _cache_get(guild_id, 'monitored_channels')
+    return cached if hit else None
+
 def add_monitored_channel(guild_id: int, channel_id: int) -> bool:
+    cached = _cached_monitored(guild_id)
+    if cached is not None and channel_id in cached:
+        return False # Already monitored; no need to open a connection just to hit the UNIQUE constraint
     conn = get_db_connection(); cursor = conn.cursor()
     try:
         cursor.execute("INSERT OR IGNORE INTO settings (guild_id) VALUES (?)", (guild_id,))
         cursor.execute("INSERT INTO monitored_channels (guild_id, channel_id) VALUES (?, ?)", (guild_id, channel_id))
-        conn.commit(); return True
-    except sqlite3.IntegrityError: logging.warning(f"Channel {channel_id} already monitored for {guild_id}."); return False 
-    except sqlite3.Error as e: logging.error(f"DB Error adding monitored_channel for {guild_id}: {e}"); return False
+        conn.commit(); _cache_replace(guild_id, 'monitored_channels', lambda cached: {**cached, channel_id: None}); return True
+    except sqlite3.IntegrityError: logging.warning("Channel %s already monitored for %s.", channel_id, guild_id); return False 
+    except sqlite3.Error as e: logging.error("DB Error adding monitored_channel for %s: %s", guild_id, e); return False
     finally: conn.close()
 
 def remove_monitored_channel(guild_id: int, channel_id: int) -> bool:
+    cached = _cached_monitored(guild_id)
+    if cached is not None and channel_id not in cached:
+        return False
     conn = get_db_connection(); cursor = conn.cursor()
     try:
         cursor.execute("DELETE FROM monitored_channels WHERE guild_id = ? AND channel_id = ?", (guild_id, channel_id))
-        conn.commit(); return cursor.rowcount > 0
-    except sqlite3.Error as e: logging.error(f"DB Error removing monitored_channel for {guild_id}: {e}"); return False
+        conn.commit()
+        _cache_replace(guild_id, 'monitored_channels', lambda cached: {c: None for c in cached if c != channel_id})
+        return cursor.rowcount > 0
+    except sqlite3.Error as e: logging.error("DB Error removing monitored_channel for %s: %s", guild_id, e); return False
     finally: conn.close()
 
 def get_monitored_channels(guild_id: int) -> List[int]: # This was the function causing an AttributeError
+    hit, cached = _cache_get(guild_id, 'monitored_channels')
+    if hit:
+        return list(cached)
     conn = get_db_connection(); cursor = conn.cursor()
     channels = []
     try:
         cursor.execute("SELECT channel_id FROM monitored_channels WHERE guild_id = ?", (guild_id,))
         channels = [row['channel_id'] for row in cursor.fetchall()]
-    except sqlite3.Error as e: logging.error(f"DB Error getting monitored_channels for {guild_id}: {e}")
+        _cache_put(guild_id, 'monitored_channels', dict.fromkeys(channels))
+    except sqlite3.Error as e: logging.error("DB Error getting monitored_channels for %s: %s", guild_id, e)
     finally: conn.close()
     return channels
 
+def get_all_config(guild_id: int) -> Tuple[Optional[Dict[str, Any]], List[int]]:
+    """Returns (settings, monitored channel ids) for a guild, reading both on one connection when not cached."""
+    settings_hit, settings = _cache_get(guild_id, 'settings')
+    channels_hit, channels = _cache_get(guild_id, 'monitored_channels')
+    if settings_hit and channels_hit:
+        return (dict(settings) if settings else None), list(channels)
+    conn = get_db_connection(); cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT * FROM settings WHERE guild_id = ?", (guild_id,))
+        row = cursor.fetchone()
+        settings = dict(row) if row else None
+        cursor.execute("SELECT channel_id FROM monitored_channels WHERE guild_id = ?", (guild_id,))
+        channels = dict.fromkeys(row['channel_id'] for row in cursor.fetchall())
+        _cache_put(guild_id, 'settings', settings)
+        _cache_put(guild_id, 'monitored_channels', channels)
+        return (dict(settings) if settings else None), list(channels)
+    except sqlite3.Error as e: logging.error("DB Error getting config for %s: %s", guild_id, e); return None, []
+    finally: conn.close()
+
 # --- Exempted Threads Functions ---
 def add_exempted_thread(guild_id: int, thread_id: int, user_id: int) -> bool:
     conn = get_db_connection(); cursor = conn.cursor()
@@ -73,6 +73,7 @@ INITIAL_EXTENSIONS = [
     #'cogs.activity_checker_cog',
     'cogs.auto_reaction_cog',
     'cogs.counting_cog',
+    'cogs.message_router_cog',
 ]
 
 @bot.event